@@ -0,0 +1,77 @@
+import numpy as np
+from picking import project
+
+#Attribute sync: every assignment to a vpython object becomes traffic to the browser, so
+#writes are queued during a frame and flushed once. A position is only sent when it has
+#moved at least min_pixels on screen since the value last sent (errors never accumulate
+#beyond that), texts and other values only when they differ. Counters show the savings.
+
+class AttributeSync:
+    def __init__(self, min_pixels=0.5, min_distance=0.0):
+        from vpython import vector #Imported here so the module loads headless
+        self._vector = vector
+        self.min_pixels = min_pixels #Screen-space threshold (used when a camera is set)
+        self.min_distance = min_distance #World-space threshold without a camera
+        self.camera = None
+        self._positions = {} #(id, name) -> (obj, name, xyz) queued this frame
+        self._values = {} #(id, name) -> (obj, name, value) queued this frame
+        self._sent = {} #(id, name) -> last value sent
+        self.sent = 0
+        self.skipped = 0
+
+    def begin(self, camera=None): #Start a frame; camera as from picking.camera_from_scene
+        self.camera = camera
+
+    def pos(self, obj, xyz, name='pos'): #Queue a position (x, y, z); the last write in a frame wins
+        self._positions[(id(obj), name)] = (obj, name, tuple(xyz))
+
+    def set(self, obj, name, value): #Queue any other attribute, sent only if it differs from the last value sent
+        self._values[(id(obj), name)] = (obj, name, value)
+
+    def text(self, obj, value):
+        self.set(obj, 'text', value)
+
+    def flush(self): #Send what changed enough, in one pass
+        if self._positions:
+            queued = list(self._positions.values())
+            keys = list(self._positions)
+            new = np.array([xyz for _, _, xyz in queued], dtype=np.float64)
+            last = np.array([self._sent.get(key, (np.nan,) * 3) for key in keys], dtype=np.float64)
+            if self.camera is not None:
+                screen_new, _, _ = project(new, self.camera)
+                screen_last, _, _ = project(last, self.camera)
+                moved = np.hypot(*(screen_new - screen_last).T)
+                limit = self.min_pixels
+            else:
+                moved = np.linalg.norm(new - last, axis=1)
+                limit = self.min_distance
+            #Never sent (nan) or not on screen (nan projection): always send
+            send = ~(moved < limit) if limit > 0 else np.any(new != last, axis=1)
+            vector = self._vector
+            for key, (obj, name, xyz), flag in zip(keys, queued, send.tolist()):
+                if flag:
+                    setattr(obj, name, vector(*xyz))
+                    self._sent[key] = xyz
+            count = int(send.sum())
+            self.sent += count
+            self.skipped += len(keys) - count
+            self._positions.clear()
+        for key, (obj, name, value) in self._values.items():
+            if key in self._sent and self._sent[key] == value:
+                self.skipped += 1
+                continue
+            setattr(obj, name, value)
+            self._sent[key] = value
+            self.sent += 1
+        self._values.clear()
+
+    def forget(self, obj, name='pos'): #Next value of this attribute is sent unconditionally
+        self._sent.pop((id(obj), name), None)
+
+    @property
+    def saved(self): #Fraction of updates that were not sent
+        total = self.sent + self.skipped
+        return self.skipped / total if total else 0.0
+
+    def stats_text(self):
+        return f'Updates: {self.sent} gesendet, {self.skipped} gespart ({self.saved:.0%})'
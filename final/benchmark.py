@@ -0,0 +1,260 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import types
+from datetime import datetime
+
+import numpy as np
+
+#Benchmark suite: drives every simulation mode headless against a stubbed renderer
+#and reports frames per second, per-phase time and memory for configurable body,
+#star and trail counts. Results are saved as JSON so runs can be compared.
+#
+#   python final/benchmark.py --bodies 8 1000 100000 --stars 2000 50000 --out bench.json
+#   python final/benchmark.py --compare bench.json   (flags regressions against an earlier run)
+
+class StubVector: #Minimal stand-in for vpython.vector
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = x, y, z
+
+    def __add__(self, o):
+        return StubVector(self.x + o.x, self.y + o.y, self.z + o.z)
+
+    def __sub__(self, o):
+        return StubVector(self.x - o.x, self.y - o.y, self.z - o.z)
+
+    def __mul__(self, k):
+        return StubVector(self.x * k, self.y * k, self.z * k)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return StubVector(-self.x, -self.y, -self.z)
+
+    @property
+    def mag(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def norm(self):
+        m = self.mag
+        return self * (1 / m) if m > 0 else StubVector()
+
+    def cross(self, o):
+        return stub_cross(self, o)
+
+
+def stub_cross(a, b):
+    return StubVector(a.y * b.z - a.z * b.y, a.z * b.x - a.x * b.z, a.x * b.y - a.y * b.x)
+
+
+class StubObject: #Stand-in for any vpython object; counts attribute pushes instead of sending them
+    pushes = 0
+
+    def __init__(self, *args, **kwargs):
+        for key, value in kwargs.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        StubObject.pushes += 1
+        object.__setattr__(self, key, value)
+
+
+class StubCurve(StubObject): #curve/points: counts points for the trail and level of detail code
+    def __init__(self, *args, **kwargs):
+        super().__init__(**kwargs)
+        object.__setattr__(self, 'npoints', len(kwargs.get('pos', ())))
+
+    def append(self, *points):
+        added = points[0] if len(points) == 1 and isinstance(points[0], list) else points
+        object.__setattr__(self, 'npoints', self.npoints + len(added))
+
+    def modify(self, i, *args, **kwargs):
+        StubObject.pushes += 1
+
+    def shift(self):
+        object.__setattr__(self, 'npoints', max(self.npoints - 1, 0))
+
+    def clear(self):
+        object.__setattr__(self, 'npoints', 0)
+
+
+def install_stub_renderer(): #Register a stub 'vpython' module so renderer code imports headless
+    stub = types.ModuleType('vpython')
+    stub.vector = StubVector
+    stub.cross = stub_cross
+    for name in ['sphere', 'simple_sphere', 'ring', 'label', 'local_light',
+                 'vertex', 'triangle', 'compound', 'canvas', 'wtext', 'winput', 'slider', 'button', 'menu']:
+        setattr(stub, name, type(name, (StubObject,), {}))
+    for name in ['points', 'curve']:
+        setattr(stub, name, type(name, (StubCurve,), {}))
+    stub.rate = lambda n: None
+    sys.modules['vpython'] = stub
+    return stub
+
+
+def synthetic_planets(count, seed=0): #Body table with the keys every mode reads
+    rng = random.Random(seed)
+    planets_data = []
+    for i in range(count):
+        radius = rng.uniform(5, 60)
+        planets_data.append({'name': f'Body {i}', 'radius': 0.5,
+                             'orbital_radius': radius,
+                             'orbital_period': (radius / 12) ** 1.5,
+                             'angle_at_start': rng.uniform(0, 2 * math.pi),
+                             'phi_offset': rng.uniform(0, 2 * math.pi),
+                             'eccentricity': rng.uniform(0, 0.25),
+                             'inclination': rng.uniform(0, 0.15),
+                             'ascending_node': rng.uniform(0, 2 * math.pi),
+                             'perihelion': rng.uniform(0, 2 * math.pi)})
+    return planets_data
+
+
+MODE_DT = {'date': 50 / 60} #Time per frame: days for the date mode, frames for the others
+PHASES = ['physics', 'planets', 'stars', 'trails', 'labels']
+
+def run_case(mode, bodies, stars, frames, trail_length, seed=0):
+    stub = sys.modules['vpython']
+    from simulation import MODES
+    from star_field import StarField, generate_star_shell
+    from trails import TrailSet
+
+    start = time.perf_counter()
+    planets_data = synthetic_planets(bodies, seed)
+    sim = MODES[mode](planets_data, datetime(2025, 5, 20)) if mode == 'date' else MODES[mode](planets_data)
+    planets = [stub.sphere(pos=StubVector(), radius=data['radius']) for data in planets_data]
+    star_field = None
+    if stars:
+        offsets, colors = generate_star_shell(1500, stars, seed=seed)
+        star_field = StarField(offsets, colors)
+    if trail_length:
+        trail_set = TrailSet(bodies, max_points=trail_length) #Bounded, decimated trails
+    else:
+        unbounded = [[] for _ in planets] #0 = unbounded, what make_trail used to do
+    info_label = stub.label(pos=StubVector(), text='')
+    setup_ms = (time.perf_counter() - start) * 1000
+
+    dt = MODE_DT.get(mode, 1)
+    totals = dict.fromkeys(PHASES, 0.0)
+    StubObject.pushes = 0
+    loop_start = time.perf_counter()
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        state = sim.step(dt)
+        t1 = time.perf_counter()
+        positions = state['positions'].tolist()
+        for planet, (x, y, z) in zip(planets, positions):
+            planet.pos = StubVector(x, y, z)
+        t2 = time.perf_counter()
+        if star_field is not None:
+            star_field.follow(StubVector(*state['sun']))
+        t3 = time.perf_counter()
+        if trail_length:
+            trail_set.push(state['positions'])
+        else:
+            for trail, p in zip(unbounded, positions):
+                trail.append(p)
+        t4 = time.perf_counter()
+        info_label.pos = planets[0].pos + StubVector(0, 2, 0)
+        info_label.text = f'Time: {state["time"]:.1f}'
+        t5 = time.perf_counter()
+        totals['physics'] += t1 - t0
+        totals['planets'] += t2 - t1
+        totals['stars'] += t3 - t2
+        totals['trails'] += t4 - t3
+        totals['labels'] += t5 - t4
+    elapsed = time.perf_counter() - loop_start
+
+    return {'mode': mode, 'bodies': bodies, 'stars': stars, 'trail_length': trail_length,
+            'frames': frames, 'setup_ms': setup_ms,
+            'fps': frames / elapsed if elapsed > 0 else float('inf'),
+            'frame_ms': elapsed * 1000 / frames,
+            'phases_ms': {name: totals[name] * 1000 / frames for name in PHASES},
+            'pushes_per_frame': StubObject.pushes / frames}
+
+
+def measure_memory(mode, bodies, stars, frames, trail_length, seed=0): #Peak traced memory of a separate run
+    tracemalloc.start()
+    try:
+        run_case(mode, bodies, stars, frames, trail_length, seed)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def case_key(result):
+    return (result['mode'], result['bodies'], result['stars'], result['trail_length'])
+
+
+def compare(results, previous, threshold): #Print fps ratios against an earlier run, return regressions
+    old = {case_key(r): r for r in previous['results']}
+    regressions = []
+    for result in results:
+        before = old.get(case_key(result))
+        if before is None:
+            continue
+        ratio = result['fps'] / before['fps']
+        flag = ''
+        if ratio < 1 - threshold:
+            flag = '  <-- REGRESSION'
+            regressions.append(result)
+        print(f"{result['mode']:>8} bodies={result['bodies']:<7} stars={result['stars']:<6} "
+              f"trail={result['trail_length']:<5} fps {before['fps']:10.1f} -> {result['fps']:10.1f} ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main(argv=None):
+    install_stub_renderer()
+    from simulation import MODES
+    parser = argparse.ArgumentParser(description='Headless benchmark of all simulation modes')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--bodies', nargs='+', type=int, default=[8, 1000, 10000])
+    parser.add_argument('--stars', nargs='+', type=int, default=[2000], help='star counts (moving mode only)')
+    parser.add_argument('--trail-length', nargs='+', type=int, default=[0], help='0 = unbounded trails')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--out', help='write results as JSON')
+    parser.add_argument('--compare', help='earlier JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='fps drop counted as regression')
+    args = parser.parse_args(argv)
+
+    results = []
+    for mode in args.modes:
+        for bodies in args.bodies:
+            for stars in (args.stars if mode == 'moving' else [0]):
+                for trail_length in args.trail_length:
+                    result = run_case(mode, bodies, stars, args.frames, trail_length, args.seed)
+                    if not args.no_memory:
+                        result['peak_memory_kb'] = measure_memory(mode, bodies, stars, args.frames, trail_length, args.seed)
+                    results.append(result)
+                    phases = ' '.join(f'{name}={ms:.3f}' for name, ms in result['phases_ms'].items())
+                    print(f"{mode:>8} bodies={bodies:<7} stars={stars:<6} trail={trail_length:<5} "
+                          f"{result['fps']:10.1f} fps  setup={result['setup_ms']:.1f}ms  [{phases}] ms"
+                          + (f"  mem={result['peak_memory_kb']:.0f}KB" if 'peak_memory_kb' in result else ''))
+
+    report = {'meta': {'timestamp': datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(), 'numpy': np.__version__,
+                       'platform': platform.platform(), 'frames': args.frames, 'seed': args.seed},
+              'results': results}
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if compare(results, previous, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import json
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+
+#State broadcast: one process computes the simulation, any number of viewers render it.
+#Messages are a (type, length) header plus payload. After a JSON hello, the server sends
+#one binary snapshot per frame: sequence, days since the epoch, pause state and float32
+#positions (sun, planets, belt). Viewers acknowledge every snapshot and at most window
+#snapshots are in flight per viewer, so a slow viewer never holds up the others and never
+#lags behind in socket buffers: its connection keeps only the newest unsent snapshot, older
+#ones are dropped, and a viewer that acknowledges nothing for stall_timeout is disconnected.
+#Viewers send JSON control messages (pause, speed, date) that apply to everyone.
+
+MESSAGE = struct.Struct('<BI') #Type, payload length
+SNAPSHOT = struct.Struct('<QdBII') #Sequence, days since epoch, paused, bodies, belt bodies
+HELLO, SNAPSHOT_TYPE, CONTROL, ACK = 1, 2, 3, 4
+DEFAULT_PORT = 8765
+
+def message(kind, payload):
+    return MESSAGE.pack(kind, len(payload)) + payload
+
+async def read_message(reader): #(type, payload); IncompleteReadError when the peer is gone
+    kind, length = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+    return kind, await reader.readexactly(length)
+
+def encode_snapshot(sequence, state, paused):
+    belt = state.get('belt')
+    parts = [np.reshape(state['sun'], (1, 3)), state['positions']] + ([belt] if belt is not None else [])
+    header = SNAPSHOT.pack(sequence, state['time'], paused, len(state['positions']), 0 if belt is None else len(belt))
+    return message(SNAPSHOT_TYPE, header + np.concatenate(parts).astype('<f4').tobytes())
+
+def decode_snapshot(payload):
+    sequence, days, paused, bodies, belt = SNAPSHOT.unpack_from(payload)
+    values = np.frombuffer(payload, dtype='<f4', offset=SNAPSHOT.size).astype(np.float64).reshape(-1, 3)
+    return {'sequence': sequence, 'time': days, 'paused': bool(paused), 'sun': values[0],
+            'positions': values[1:1 + bodies], 'belt': values[1 + bodies:] if belt else None}
+
+
+class _Viewer:
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = None #Newest snapshot not yet written
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.in_flight = 0 #Sent but not acknowledged
+        self.acked = asyncio.get_running_loop().time() #Time of the last acknowledgement
+        self.dropped = 0 #Snapshots replaced before they could be sent
+
+
+class BroadcastServer:
+    def __init__(self, hello, host='127.0.0.1', port=DEFAULT_PORT, stall_timeout=5.0, on_control=None,
+                 window=2, high_water=0):
+        self.hello = message(HELLO, json.dumps(hello).encode())
+        self.host = host
+        self.port = port #0 picks a free port, see start()
+        self.stall_timeout = stall_timeout #Seconds a viewer may block before it is disconnected
+        self.on_control = on_control #Called with each control dict from a viewer
+        self.window = window #Unacknowledged snapshots per viewer
+        self.high_water = high_water #Bytes buffered before drain() waits; 0: only what the kernel takes
+        self.viewers = set()
+        self.published = 0
+        self.dropped = 0 #Snapshots replaced before they could be sent, all viewers
+        self.disconnected = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    def publish(self, data): #Hand a snapshot to every viewer; never waits for one
+        self.published += 1
+        for viewer in self.viewers:
+            if viewer.pending is not None:
+                viewer.dropped += 1
+                self.dropped += 1
+            viewer.pending = data
+            viewer.ready.set()
+
+    async def _serve(self, reader, writer):
+        writer.transport.set_write_buffer_limits(high=self.high_water)
+        viewer = _Viewer(writer)
+        writer.write(self.hello)
+        self.viewers.add(viewer)
+        sender = asyncio.ensure_future(self._send(viewer))
+        try:
+            while True: #Acknowledgements and control messages from this viewer
+                kind, payload = await read_message(reader)
+                if kind == ACK:
+                    viewer.in_flight = max(0, viewer.in_flight - 1)
+                    viewer.acked = asyncio.get_running_loop().time()
+                    viewer.ready.set()
+                elif kind == CONTROL and self.on_control is not None:
+                    self.on_control(json.loads(payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.viewers.discard(viewer)
+            sender.cancel()
+            writer.close()
+
+    async def _send(self, viewer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await viewer.ready.wait()
+                viewer.ready.clear()
+                if viewer.in_flight >= self.window: #Behind: wait for an acknowledgement, keep the newest
+                    if loop.time() - viewer.acked > self.stall_timeout:
+                        raise asyncio.TimeoutError
+                    continue
+                if viewer.pending is None:
+                    continue
+                data, viewer.pending = viewer.pending, None
+                viewer.in_flight += 1
+                viewer.writer.write(data)
+                viewer.sent += 1
+                await asyncio.wait_for(viewer.writer.drain(), self.stall_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            if viewer in self.viewers: #Not when close() ended the connection
+                self.disconnected += 1
+            self.viewers.discard(viewer)
+            viewer.writer.close()
+
+    async def close(self):
+        viewers, self.viewers = self.viewers, set()
+        for viewer in viewers:
+            viewer.writer.close()
+        self._server.close()
+        await self._server.wait_closed()
+
+
+async def serve(sim, planets_data, host='127.0.0.1', port=DEFAULT_PORT, fps=60, speed=50, paused=False,
+                duration=None, on_start=None):
+    #Run sim and broadcast it at fps; speed in days per second as in version_1
+    from ephemeris import fingerprint
+    control = {'paused': paused, 'speed': speed, 'date': None}
+
+    def on_control(values): #Applied before the next step
+        if values.get('toggle_pause'):
+            control['paused'] = not control['paused']
+        for key in ('paused', 'speed', 'date'):
+            if key in values:
+                control[key] = values[key]
+
+    epoch = getattr(sim, 'base', sim).epoch #An NBodySimulation keeps its DateSimulation as base
+    hello = {'names': [data['name'] for data in planets_data], 'epoch': epoch.isoformat(),
+             'fingerprint': fingerprint(planets_data, epoch, 'any'), 'fps': fps}
+    server = BroadcastServer(hello, host, port, on_control=on_control)
+    await server.start()
+    if on_start is not None:
+        on_start(server)
+    loop = asyncio.get_running_loop()
+    physics = ThreadPoolExecutor(1) #Steps run off the event loop, so sockets stay responsive
+    state = sim.state()
+    sequence = 0
+    started = next_frame = loop.time()
+    try:
+        while duration is None or loop.time() - started < duration:
+            if control['date'] is not None:
+                date = datetime.fromisoformat(control['date'])
+                control['date'] = None
+                state = await loop.run_in_executor(physics, sim.set_date, date)
+            elif not control['paused']:
+                state = await loop.run_in_executor(physics, sim.step, control['speed'] / fps)
+            sequence += 1
+            server.publish(encode_snapshot(sequence, state, control['paused']))
+            next_frame += 1 / fps #Fixed schedule: a late frame does not shift the following ones
+            delay = next_frame - loop.time()
+            if delay < -1 / fps: #More than a frame behind: continue from now instead of catching up
+                next_frame -= delay
+            await asyncio.sleep(max(0.0, delay))
+    finally:
+        physics.shutdown()
+        await server.close()
+    return server
+
+
+class BroadcastClient: #Receives snapshots in a background thread; the render loop reads latest
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.hello = None
+        self.latest = None #Newest decoded snapshot
+        self.received = 0
+        self.connected = threading.Event()
+        self.closed = False
+        self._loop = None
+        self._writer = None
+
+    async def run(self): #Connect and read until the server goes away
+        reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            kind, payload = await read_message(reader)
+            self.hello = json.loads(payload)
+            self.connected.set()
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == SNAPSHOT_TYPE:
+                    self.latest = decode_snapshot(payload)
+                    self.received += 1
+                    self._writer.write(message(ACK, b''))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.closed = True
+            self._writer.close()
+
+    def start(self, timeout=10): #Run in a daemon thread, return once the hello has arrived
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.run())
+        threading.Thread(target=run, daemon=True).start()
+        if not self.connected.wait(timeout):
+            raise ConnectionError(f'No broadcast server at {self.host}:{self.port}')
+        return self
+
+    def control(self, **values): #Thread-safe: e.g. control(toggle_pause=True), control(speed=100)
+        data = message(CONTROL, json.dumps(values).encode())
+        self._loop.call_soon_threadsafe(self._writer.write, data)
+
+
+class RemoteSimulation: #DateSimulation interface over a BroadcastClient, for version_1 as a viewer
+    def __init__(self, client, planets_data):
+        from ephemeris import fingerprint
+        self.client = client
+        self.epoch = datetime.fromisoformat(client.hello['epoch'])
+        if client.hello['fingerprint'] != fingerprint(planets_data, self.epoch, 'any'):
+            print('Broadcast: the server uses different planet data than this viewer')
+        while client.latest is None and not client.closed:
+            time.sleep(0.01)
+        self._apply(client.latest)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _apply(self, snapshot):
+        self.snapshot = snapshot
+        self.time = snapshot['time']
+        self.date = self.epoch + timedelta(days=self.time)
+        self.sun = snapshot['sun']
+        self.positions = snapshot['positions']
+        self.belt = snapshot['belt']
+        return self.state()
+
+    @property
+    def paused(self):
+        return self.snapshot['paused']
+
+    def step(self, dt=1): #The server decides how far time moves; this takes the newest snapshot
+        latest = self.client.latest
+        if latest is not self.snapshot:
+            self._apply(latest)
+        return self.state()
+
+    def set_date(self, date): #Asks the server to jump; the jump arrives with the next snapshots
+        self.client.control(date=date.isoformat())
+        return self.state()
+
+    def toggle_pause(self):
+        self.client.control(toggle_pause=True)
+
+    def set_speed(self, speed):
+        self.client.control(speed=speed)
+
+    def state(self):
+        return {'time': self.time, 'sun': self.sun, 'positions': self.positions, 'belt': self.belt, 'date': self.date}
+
+
+def _date_simulation(args): #The simulation version_1 would run
+    import catalog
+    from simulation import DateSimulation
+    planets_data = catalog.load(args.catalog).planets_data('date')
+    sim = DateSimulation(planets_data, catalog.DATE_EPOCH)
+    if args.nbody:
+        from nbody import NBodySimulation
+        sim = NBodySimulation(sim, planets_data, belt_count=args.belt)
+    return sim, planets_data
+
+async def _bench(args): #Server plus local viewers, one of them too slow to keep up
+    sim, planets_data = _date_simulation(args)
+    started = asyncio.get_running_loop().create_future()
+    task = asyncio.ensure_future(serve(sim, planets_data, port=0, fps=args.fps, duration=args.seconds,
+                                       on_start=started.set_result))
+    await asyncio.wait([started, task], return_when=asyncio.FIRST_COMPLETED)
+    if not started.done(): #serve() failed before it could listen
+        return task.result()
+    server = started.result()
+    results = []
+
+    async def viewer(slow):
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        received = lag = 0
+        last = None
+        try:
+            await read_message(reader) #Hello
+            while True:
+                kind, payload = await read_message(reader)
+                last = decode_snapshot(payload)
+                received += 1
+                lag = max(lag, server.published - last['sequence']) #Frames behind the server
+                if slow:
+                    await asyncio.sleep(4 / args.fps) #Renders at a quarter of the server rate
+                writer.write(message(ACK, b''))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+        results.append((slow, received, lag, last))
+
+    viewers = [asyncio.ensure_future(viewer(i == 0)) for i in range(args.clients)]
+    await task
+    await asyncio.gather(*viewers)
+    for slow, received, lag, last in sorted(results, key=lambda r: not r[0]):
+        error = np.abs(last['positions'] - sim.positions_at(last['time'])).max() if last and not args.nbody else 0.0
+        print(f"{'slow' if slow else 'fast'} viewer: {received}/{server.published} snapshots, "
+              f"at most {lag} frames behind, position error {error:.1e}")
+    print(f'{len(encode_snapshot(0, sim.state(), False))} bytes per snapshot, {server.dropped} dropped for slow viewers, '
+          f'{server.disconnected} viewers disconnected')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Broadcast one simulation to many viewers on this machine')
+    parser.add_argument('command', choices=['serve', 'view', 'bench'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--fps', type=int, default=60)
+    parser.add_argument('--nbody', action='store_true')
+    parser.add_argument('--belt', type=int, default=1500, help='asteroid belt bodies with --nbody')
+    parser.add_argument('--catalog', default=None)
+    parser.add_argument('--clients', type=int, default=8, help='bench: local viewers')
+    parser.add_argument('--seconds', type=float, default=5, help='bench: duration')
+    args = parser.parse_args(argv)
+    if args.catalog is None:
+        import catalog
+        args.catalog = catalog.DEFAULT_PATH
+
+    if args.command == 'serve':
+        sim, planets_data = _date_simulation(args)
+        print(f'Broadcasting on {args.host}:{args.port}')
+        asyncio.run(serve(sim, planets_data, args.host, args.port, fps=args.fps))
+    elif args.command == 'view':
+        from final_basic import version_1
+        version_1(remote=(args.host, args.port), catalog_path=args.catalog)
+    else:
+        asyncio.run(_bench(args))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+import numpy as np
+
+#Body catalog shared by every version, the presentations and the headless tools. Bodies
+#are read from CSV, JSON (an array or one object per line) or a compact .npy table and
+#kept as columns. Text files are streamed in chunks of rows, so a file with a million
+#minor planets never exists as a million dicts; .npy tables are memory-mapped as they are.
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'planets.json')
+MOONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'moons.json') #Bodies with a 'parent' planet
+DATE_EPOCH = datetime(2025, 5, 20) #version_1: date at which every planet is at its 'angle_at_start'
+
+STRING_FIELDS = ('name', 'texture', 'parent') #parent: body this one orbits, empty for the sun
+FLOAT_FIELDS = ( #Missing values are nan; angles in degrees in the files
+    'radius', 'orbital_radius', #Scene units
+    'orbital_period', 'angle_at_start_deg', #version_1: years, mean longitude at DATE_EPOCH
+    'frame_period', 'phi_offset_deg', #Visual modes: period * 100 frames, start angle
+    'eccentricity', 'inclination_deg', 'ascending_node_deg', 'perihelion_deg', #Optional orbital elements
+    'mass', #Sun masses
+    'real_radius_km', 'real_orbital_radius_mio_km',
+    'color_r', 'color_g', 'color_b', #0..1, 'color': [r, g, b] in JSON
+)
+ELEMENTS = (('eccentricity', 'eccentricity'), ('inclination', 'inclination_deg'),
+            ('ascending_node', 'ascending_node_deg'), ('perihelion', 'perihelion_deg'))
+
+class Catalog:
+    def __init__(self, columns): #Field -> array, one entry per body
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns['name'])
+
+    def __getitem__(self, field):
+        return self.columns[field]
+
+    def select(self, rows): #Subset by boolean mask or indices
+        return Catalog({field: np.asarray(column)[rows] for field, column in self.columns.items()})
+
+    def named(self, names): #Bodies in the given order, e.g. named(['Earth', 'Mars'])
+        index = {name: i for i, name in enumerate(self.columns['name'].tolist())}
+        return self.select([index[name] for name in names])
+
+    @property
+    def colors(self): #(n, 3), nan where a body has no color
+        return np.column_stack([self.columns[field] for field in ('color_r', 'color_g', 'color_b')])
+
+    def planets_data(self, mode='frame', elements=None): #Body dicts as the simulations expect them
+        #mode='date': periods in years and 'angle_at_start' (version_1), 'frame': frame periods and 'phi_offset'
+        #elements: include the orbital elements (default: only for 'date', the frame modes use circles)
+        if elements is None:
+            elements = mode == 'date'
+        period, angle, angle_key = (('orbital_period', 'angle_at_start_deg', 'angle_at_start') if mode == 'date'
+                                    else ('frame_period', 'phi_offset_deg', 'phi_offset'))
+        columns = {field: np.asarray(column).tolist() for field, column in self.columns.items()}
+        planets_data = []
+        for i in range(len(self)):
+            data = {'name': columns['name'][i], 'radius': columns['radius'][i],
+                    'orbital_radius': columns['orbital_radius'][i], 'orbital_period': columns[period][i],
+                    angle_key: math.radians(columns[angle][i]) if math.isfinite(columns[angle][i]) else 0.0}
+            if elements:
+                for key, field in ELEMENTS:
+                    value = columns[field][i]
+                    if math.isfinite(value):
+                        data[key] = value if key == 'eccentricity' else math.radians(value)
+            for key in ('mass', 'real_radius_km', 'real_orbital_radius_mio_km'):
+                if math.isfinite(columns[key][i]):
+                    data[key] = columns[key][i]
+            for key in ('texture', 'parent'):
+                if columns[key][i]:
+                    data[key] = columns[key][i]
+            color = (columns['color_r'][i], columns['color_g'][i], columns['color_b'][i])
+            if all(math.isfinite(c) for c in color):
+                data['color'] = color
+            planets_data.append(data)
+        return planets_data
+
+
+def _float_column(values): #Numbers or numeric strings; '' and None become nan
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([float(v) if v not in ('', None) else np.nan for v in values], dtype=np.float64)
+
+def _chunks(rows, chunk): #Lists of at most chunk rows
+    rows = iter(rows)
+    while True:
+        block = list(islice(rows, chunk))
+        if not block:
+            return
+        yield block
+
+def _join(parts): #Catalog from the converted chunks of every field
+    return Catalog({field: np.concatenate(blocks) if blocks else np.zeros(0, dtype=object if field in STRING_FIELDS else np.float64)
+                    for field, blocks in parts.items()})
+
+def from_rows(rows, chunk=65536): #Catalog from dicts (field -> value), converted chunk by chunk
+    parts = {field: [] for field in STRING_FIELDS + FLOAT_FIELDS}
+    for block in _chunks(rows, chunk):
+        for field in STRING_FIELDS:
+            parts[field].append(np.array([row.get(field) or '' for row in block], dtype=object))
+        for field in FLOAT_FIELDS:
+            parts[field].append(_float_column([row.get(field) for row in block]))
+    return _join(parts)
+
+def _from_csv(path, chunk): #Columns straight from the rows, without a dict per row
+    parts = {field: [] for field in STRING_FIELDS + FLOAT_FIELDS}
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        index = {name: j for j, name in enumerate(header)}
+        for block in _chunks(reader, chunk):
+            columns = list(zip(*block))
+            for field in STRING_FIELDS + FLOAT_FIELDS:
+                if field in index:
+                    values = columns[index[field]]
+                    part = np.array(values, dtype=object) if field in STRING_FIELDS else _float_column(values)
+                elif field in STRING_FIELDS:
+                    part = np.full(len(block), '', dtype=object)
+                else:
+                    part = np.full(len(block), np.nan)
+                parts[field].append(part)
+    return _join(parts)
+
+def iter_json(path, block=1 << 16): #Objects of a JSON array or JSON lines file, read incrementally
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        buffer = f.read(block)
+        pos = 0
+        eof = not buffer
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,[':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            if pos == len(buffer):
+                if eof:
+                    return
+                buffer, pos = f.read(block), 0
+                eof = not buffer
+                continue
+            try:
+                row, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                more = f.read(block)
+                if not more: #Truncated or invalid, nothing left to read
+                    raise
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            pos = end
+            if 'color' in row: #[r, g, b]
+                row['color_r'], row['color_g'], row['color_b'] = row.pop('color')
+            yield row
+
+def load(path=DEFAULT_PATH, chunk=65536): #Catalog from .csv, .json/.jsonl or .npy
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy': #Columns are views into the memory-mapped table, fields it leaves out are empty
+        table = np.load(path, mmap_mode='r')
+        columns = {field: table[field] for field in table.dtype.names}
+        for field in STRING_FIELDS + FLOAT_FIELDS:
+            if field not in columns:
+                columns[field] = np.full(len(table), '', dtype=object) if field in STRING_FIELDS else np.full(len(table), np.nan)
+        return Catalog(columns)
+    if extension == '.csv':
+        return _from_csv(path, chunk)
+    if extension in ('.json', '.jsonl'):
+        return from_rows(iter_json(path), chunk)
+    raise ValueError(f'Unknown catalog format: {path}')
+
+def save(catalog, path): #.npy (compact, memory-mappable), .csv or .json (one object per line)
+    extension = os.path.splitext(path)[1].lower()
+    columns = {field: np.asarray(catalog[field]) for field in STRING_FIELDS + FLOAT_FIELDS}
+    if extension == '.npy': #Only fields with at least one value, strings as wide as the longest
+        width = {field: max([len(s) for s in columns[field].tolist()] + [1]) for field in STRING_FIELDS}
+        dtype = [(field, f'U{width[field]}') for field in STRING_FIELDS if field == 'name' or width[field] > 1 or columns[field].any()]
+        dtype += [(field, '<f8') for field in FLOAT_FIELDS if not np.isnan(columns[field]).all()]
+        table = np.empty(len(catalog), dtype=dtype)
+        for field in table.dtype.names:
+            table[field] = columns[field]
+        np.save(path, table)
+        return
+    fields = STRING_FIELDS + FLOAT_FIELDS
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if extension == '.csv':
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for row in zip(*(columns[field].tolist() for field in fields)):
+                writer.writerow(['' if isinstance(v, float) and math.isnan(v) else v for v in row])
+        elif extension in ('.json', '.jsonl'):
+            array = extension == '.json'
+            f.write('[\n' if array else '')
+            for i, row in enumerate(zip(*(columns[field].tolist() for field in fields))):
+                data = {field: v for field, v in zip(fields, row) if not (isinstance(v, float) and math.isnan(v)) and v != ''}
+                f.write((',\n' if array and i else '') + json.dumps(data) + ('' if array else '\n'))
+            f.write('\n]\n' if array else '')
+        else:
+            raise ValueError(f'Unknown catalog format: {path}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load a body catalog and optionally convert it (e.g. CSV to .npy)')
+    parser.add_argument('source', nargs='?', default=DEFAULT_PATH, help='.csv, .json, .jsonl or .npy')
+    parser.add_argument('--out', help='write the catalog in the format of this extension')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    catalog = load(args.source)
+    elapsed = time.perf_counter() - start
+    print(f'{len(catalog)} bodies from {args.source} in {elapsed:.2f} s')
+    if args.out:
+        save(catalog, args.out)
+        print(f'-> {args.out} ({os.path.getsize(args.out) / 1024:.0f} KB)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
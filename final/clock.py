@@ -0,0 +1,51 @@
+import time
+import numpy as np
+
+#Fixed-timestep clock: rendering runs at a steady frame rate while the simulation is
+#advanced in fixed steps through an accumulator. The speed only changes how much
+#simulated time passes per second, never the frame rate. Frame times are smoothed,
+#and after a stall at most max_substeps are caught up, the rest is dropped.
+
+class FixedStepClock:
+    def __init__(self, step=1.0, speed=60.0, target_fps=60, max_substeps=8, smoothing=0.1,
+                 max_frame_time=0.25, timer=None):
+        self.step = step #Simulated time per fixed step
+        self.speed = speed #Fixed steps per second of real time
+        self.target_fps = target_fps #Render rate, e.g. for rate()
+        self.max_substeps = max_substeps #Cap on steps per frame (catching up after a stall)
+        self.smoothing = smoothing #Weight of the newest frame time in the running average
+        self.max_frame_time = max_frame_time #Longer frames (window dragged, breakpoint) count as this long
+        self.timer = timer or time.perf_counter
+        self.frame_time = 1 / target_fps #Smoothed real time per frame
+        self.accumulator = 0.0 #Steps owed but not yet taken
+        self.alpha = 0.0 #Fraction of the next step already elapsed, for interpolated rendering
+        self.dropped = 0.0 #Steps skipped because of the cap
+        self._last = None
+
+    def tick(self, running=True): #Call once per rendered frame; returns how many fixed steps to take
+        now = self.timer()
+        if self._last is None:
+            self._last = now
+            return 0
+        dt = min(now - self._last, self.max_frame_time)
+        self._last = now
+        self.frame_time += self.smoothing * (dt - self.frame_time)
+        if not running: #Paused: time passes, the simulation does not
+            return 0
+        self.accumulator += self.frame_time * self.speed
+        steps = int(self.accumulator)
+        if steps > self.max_substeps:
+            self.dropped += steps - self.max_substeps
+            steps = self.max_substeps
+            self.accumulator -= int(self.accumulator)
+        else:
+            self.accumulator -= steps
+        self.alpha = self.accumulator
+        return steps
+
+    def interpolate(self, previous, current, out=None): #Positions between the last two steps for rendering
+        return np.add(previous, (current - previous) * self.alpha, out=out)
+
+    @property
+    def fps(self): #Smoothed frames per second actually reached
+        return 1 / self.frame_time if self.frame_time > 0 else 0.0
@@ -0,0 +1,205 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import struct
+import sys
+from datetime import datetime, timedelta
+import numpy as np
+
+#Ephemeris table: positions of every body sampled over a date range are written once to
+#a compact binary file (header, JSON metadata, float32 samples x bodies x 3). The file is
+#memory-mapped and interpolated at run time, so a lookup only touches four samples,
+#however expensive the model that produced them.
+#
+#   python final/ephemeris.py --start 1950-01-01 --end 2100-01-01 --step 1
+#   python final/ephemeris.py --model nbody --out final/ephemeris_nbody.bin
+
+MAGIC = b'SSEPHEM1'
+HEADER = struct.Struct('<8sIIQ') #magic, metadata length, bodies, samples
+ALIGN = 64 #Samples start on a 64 byte boundary
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ephemeris.bin')
+ORBIT_KEYS = ['name', 'orbital_radius', 'orbital_period', 'angle_at_start', 'eccentricity',
+              'inclination', 'ascending_node', 'perihelion', 'mass']
+
+def fingerprint(planets_data, epoch, model): #Identifies the inputs a table was made from
+    rows = [[data.get(key) for key in ORBIT_KEYS] for data in planets_data]
+    text = json.dumps([rows, epoch.isoformat(), model])
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+def tabulate(sim, start, end, step_days, path, meta=None, chunk=4096): #Sample sim from start to end, streamed to path
+    samples = int(math.floor((end - start).total_seconds() / 86400 / step_days)) + 1
+    bodies = len(sim)
+    meta = dict(meta or {}, start=start.isoformat(), step_days=step_days)
+    meta_bytes = json.dumps(meta).encode()
+    offset = -(-(HEADER.size + len(meta_bytes)) // ALIGN) * ALIGN
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(meta_bytes), bodies, samples))
+        f.write(meta_bytes)
+        f.write(b'\0' * (offset - HEADER.size - len(meta_bytes)))
+        block = np.empty((min(chunk, samples), bodies, 3), dtype='<f4')
+        state = sim.set_date(start)
+        done = 0
+        while done < samples:
+            n = min(chunk, samples - done)
+            for i in range(n):
+                if done + i:
+                    state = sim.step(step_days)
+                block[i] = state['positions']
+            f.write(block[:n].tobytes())
+            done += n
+    os.replace(tmp, path) #Atomic, a half-written table is never read
+    return samples
+
+
+class Ephemeris: #Memory-mapped table with cubic interpolation between samples
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, meta_length, bodies, samples = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"Not an ephemeris file: {path}")
+            self.meta = json.loads(f.read(meta_length))
+        offset = -(-(HEADER.size + meta_length) // ALIGN) * ALIGN
+        self.samples = np.memmap(path, dtype='<f4', mode='r', offset=offset, shape=(samples, bodies, 3))
+        self.start = datetime.fromisoformat(self.meta['start'])
+        self.step_days = self.meta['step_days']
+        self.end = self.start + timedelta(days=self.step_days * (samples - 1))
+
+    def __len__(self):
+        return self.samples.shape[1]
+
+    def covers(self, date):
+        return self.start <= date <= self.end
+
+    def positions_at(self, date, out=None): #Catmull-Rom spline through the four samples around date
+        x = (date - self.start).total_seconds() / 86400 / self.step_days
+        last = len(self.samples) - 1
+        i = min(max(int(math.floor(x)), 0), max(last - 1, 0))
+        f = x - i
+        p0, p1, p2, p3 = (self.samples[min(max(j, 0), last)].astype(np.float64) for j in (i - 1, i, i + 1, i + 2))
+        f2 = f * f
+        f3 = f2 * f
+        if out is None:
+            out = np.empty(p1.shape)
+        out[:] = 0.5 * ((2 * p1) + (p2 - p0) * f + (2 * p0 - 5 * p1 + 4 * p2 - p3) * f2 + (3 * p1 - p0 - 3 * p2 + p3) * f3)
+        return out
+
+    def velocities_at(self, date): #Per day; one-sided second-order difference over samples inside the table
+        h = self.step_days if date + timedelta(days=2 * self.step_days) <= self.end else -self.step_days
+        p0, p1, p2 = (self.positions_at(date + timedelta(days=k * h)) for k in range(3))
+        return (-3 * p0 + 4 * p1 - p2) / (2 * h)
+
+    def close(self):
+        self.samples._mmap.close()
+
+
+class EphemerisSimulation: #DateSimulation interface, positions from the table (the model only outside its range)
+    def __init__(self, base, ephemeris, model=None, handover_days=30):
+        #base: DateSimulation the table's dates refer to; model: the table's model when it is not
+        #the base's Kepler orbits (an NBodySimulation), continued outside the table. A step across
+        #an edge continues the model from the table's state there; a jump further than handover_days
+        #outside restarts it at the date, as the model does for any jump.
+        self.base = base
+        self.ephemeris = ephemeris
+        self.model = model
+        self.handover_days = handover_days
+        self._outside = False #The model is running outside the table
+        self.epoch = base.epoch
+        self.engine = base.engine
+        self.sun = base.sun
+        self.positions = np.zeros((len(base), 3))
+        self.set_date(base.date)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def days_since_epoch(self, date):
+        return self.base.days_since_epoch(date)
+
+    def step(self, dt=1):
+        return self.set_date(self.date + timedelta(days=dt))
+
+    def set_time(self, t):
+        return self.set_date(self.epoch + timedelta(days=t))
+
+    def set_date(self, date):
+        self.date = date
+        self.time = self.days_since_epoch(date)
+        if self.ephemeris.covers(date):
+            self.ephemeris.positions_at(date, out=self.positions)
+            self._outside = False
+        elif self.model is None:
+            self.positions[:] = self.base.set_date(date)['positions']
+        else:
+            self.positions[:] = self._continue_model(date)['positions']
+        return self.state()
+
+    def _continue_model(self, date):
+        model, table = self.model, self.ephemeris
+        if not self._outside: #Just left the table: start the model at the edge it left by
+            edge = table.end if date > table.end else table.start
+            if abs((date - edge).total_seconds()) / 86400 > self.handover_days:
+                self._outside = True
+                return model.set_date(date)
+            positions = table.positions_at(edge)
+            velocities = table.velocities_at(edge)
+            bodies = np.concatenate([self.base.sun[None, :], positions])
+            motion = np.concatenate([np.zeros((1, 3)), velocities])
+            motion[0] -= (model.masses[1:, None] * velocities).sum(axis=0) / model.masses[0] #Barycenter at rest
+            model.set_state(self.days_since_epoch(edge), bodies, motion)
+            self._outside = True
+        dt = self.time - model.time
+        if abs(dt) > self.handover_days:
+            return model.set_date(date)
+        return model.step(dt)
+
+    def state(self):
+        return {'time': self.time, 'sun': self.sun, 'positions': self.positions, 'date': self.date}
+
+
+def load(path, planets_data, epoch, model='kepler'): #Ephemeris for exactly these inputs, or None (missing or outdated file)
+    if not os.path.isfile(path):
+        return None
+    try:
+        ephemeris = Ephemeris(path)
+    except (OSError, ValueError) as e:
+        print(f"Error loading ephemeris {path}: {e}")
+        return None
+    if ephemeris.meta.get('fingerprint') != fingerprint(planets_data, epoch, model):
+        print(f"Ephemeris {path} does not match the planet data or model, ignored (rebuild with final/ephemeris.py)")
+        ephemeris.close()
+        return None
+    return ephemeris
+
+
+def main(argv=None):
+    import catalog
+    from simulation import DateSimulation
+    parser = argparse.ArgumentParser(description='Tabulate planet positions into a memory-mappable ephemeris file')
+    parser.add_argument('--start', default='1950-01-01', help='first date (YYYY-MM-DD)')
+    parser.add_argument('--end', default='2100-01-01', help='last date (YYYY-MM-DD)')
+    parser.add_argument('--step', type=float, default=1.0, help='days between samples')
+    parser.add_argument('--model', choices=['kepler', 'nbody'], default='kepler')
+    parser.add_argument('--out', default=DEFAULT_PATH)
+    parser.add_argument('--catalog', default=catalog.DEFAULT_PATH, help='body catalog (.json, .csv or .npy)')
+    args = parser.parse_args(argv)
+
+    start = datetime.strptime(args.start, '%Y-%m-%d')
+    end = datetime.strptime(args.end, '%Y-%m-%d')
+    planets_data = catalog.load(args.catalog).planets_data('date')
+    sim = DateSimulation(planets_data, catalog.DATE_EPOCH)
+    if args.model == 'nbody': #Planets only, integrated from start to end
+        from nbody import NBodySimulation
+        sim = NBodySimulation(sim, planets_data)
+    meta = {'names': [data['name'] for data in planets_data], 'model': args.model,
+            'fingerprint': fingerprint(planets_data, catalog.DATE_EPOCH, args.model)}
+    samples = tabulate(sim, start, end, args.step, args.out, meta)
+    print(f"{samples} samples x {len(sim)} bodies -> {args.out} ({os.path.getsize(args.out) / 1024:.0f} KB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
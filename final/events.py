@@ -0,0 +1,247 @@
+import argparse
+import math
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import combinations
+import numpy as np
+
+#Event search: conjunctions (two bodies in the same direction), oppositions (opposite
+#directions) and alignments (several bodies within a narrow arc), seen from the sun or from
+#another body. A date range is sampled in one batched trajectory pass, sign changes and
+#runs of alignment are bracketed, and all brackets are refined together (regula falsi for
+#the pairs, golden section for the alignments). Date chunks are searched in parallel.
+#
+#   python final/events.py --start 2025-01-01 --end 2050-01-01
+#   python final/events.py --observer Earth --kinds conjunction --workers 4
+
+Event = namedtuple('Event', 'time kind bodies value') #Days since the epoch, kind, body names, angle (radians)
+KINDS = {'conjunction': 'Konjunktion', 'opposition': 'Opposition', 'alignment': 'Aufreihung'}
+GOLDEN = (math.sqrt(5) - 1) / 2
+
+def wrap(angle): #To [-pi, pi)
+    return np.remainder(angle + math.pi, 2 * math.pi) - math.pi
+
+
+class _Sky: #Directions of the bodies as seen from an observer (the sun by default)
+    def __init__(self, planets_data, epoch, observer=None):
+        from simulation import DateSimulation
+        self.sim = DateSimulation(planets_data, epoch)
+        names = [data['name'] for data in planets_data]
+        if observer in (None, 'Sun'):
+            self.observer = None
+            self.names = names
+        else: #The sun becomes one of the bodies, the observer is left out
+            self.observer = names.index(observer)
+            self.names = ['Sun'] + [name for name in names if name != observer]
+
+    def directions(self, times): #(T, bodies, 3) from the observer
+        sun, positions = self.sim.trajectory(np.asarray(times, dtype=np.float64))
+        if self.observer is None:
+            return positions - sun[:, None]
+        bodies = np.concatenate([sun[:, None], positions], axis=1)
+        return np.delete(bodies, self.observer + 1, axis=1) - positions[:, self.observer, None]
+
+    def longitudes(self, times): #(T, bodies) angle in the ecliptic (the x-z plane)
+        d = self.directions(times)
+        return np.arctan2(d[..., 2], d[..., 0])
+
+
+def _regula_falsi(f, a, b, fa, fb, tol, iterations=60): #Roots of f in [a, b] for many brackets at once (Illinois)
+    for _ in range(iterations):
+        c = b - fb * (b - a) / (fb - fa)
+        fc = f(c)
+        flip = (fc < 0) != (fb < 0)
+        a, fa = np.where(flip, b, a), np.where(flip, fb, fa * 0.5)
+        b, fb = c, fc
+        if np.all(np.abs(fc) < tol):
+            break
+    return b
+
+def _golden(f, a, b, iterations=40): #Minimum of f in [a, b] for many intervals at once
+    for _ in range(iterations):
+        c = b - GOLDEN * (b - a)
+        d = a + GOLDEN * (b - a)
+        left = f(c) < f(d)
+        a, b = np.where(left, a, c), np.where(left, d, b)
+    return (a + b) / 2
+
+def _spread(longitudes): #Smallest arc (E,) that holds the longitudes (E, k) of each row
+    ordered = np.sort(np.remainder(longitudes, 2 * math.pi), axis=1)
+    gaps = np.diff(ordered, axis=1, append=ordered[:, :1] + 2 * math.pi)
+    return 2 * math.pi - gaps.max(axis=1)
+
+def _angle(a, b): #Angle between direction vectors (..., 3)
+    cos = np.sum(a * b, axis=-1) / (np.linalg.norm(a, axis=-1) * np.linalg.norm(b, axis=-1))
+    return np.arccos(np.clip(cos, -1, 1))
+
+
+def scan(planets_data, epoch, start, stop, step=1.0, observer=None, kinds=tuple(KINDS), min_bodies=4,
+         width=math.radians(30), margin=365.0, tol=1e-10):
+    #Events with start < time <= stop (days since the epoch). Runs by itself in a worker process.
+    #min_bodies and width: an alignment is min_bodies or more within an arc of width radians;
+    #margin: days sampled beyond both ends, so an alignment across a chunk border is seen whole
+    sky = _Sky(planets_data, epoch, observer)
+    first = math.floor((start - margin) / step) #Samples on multiples of step: the same events however the range is chunked
+    times = step * np.arange(first, math.ceil((stop + margin) / step) + 1)
+    longitudes = sky.longitudes(times)
+    events = []
+
+    #Pairs: sign changes of the wrapped longitude difference (minus pi for oppositions)
+    pairs = np.array(list(combinations(range(len(sky.names)), 2)))
+    brackets = []
+    for kind, target in (('conjunction', 0.0), ('opposition', math.pi)):
+        if kind not in kinds:
+            continue
+        d = wrap(longitudes[:, pairs[:, 0]] - longitudes[:, pairs[:, 1]] - target)
+        crossing = ((d[:-1] < 0) != (d[1:] < 0)) & (np.abs(d[1:] - d[:-1]) < math.pi) #Not the jump at +-pi
+        m, p = np.nonzero(crossing)
+        brackets.append((m, p, d[m, p], d[m + 1, p], np.full(len(m), target), [kind] * len(m)))
+    if brackets:
+        m, p, fa, fb, target, kind = (np.concatenate(parts) for parts in zip(*brackets))
+        i, j = pairs[p, 0], pairs[p, 1]
+        rows = np.arange(len(m))
+
+        def difference(t):
+            lon = sky.longitudes(t)
+            return wrap(lon[rows, i] - lon[rows, j] - target)
+
+        roots = _regula_falsi(difference, times[m], times[m + 1], fa, fb, tol)
+        d = sky.directions(roots)
+        separation = _angle(d[rows, i], d[rows, j])
+        for t, k, a, b, value in zip(roots.tolist(), kind.tolist(), i.tolist(), j.tolist(), separation.tolist()):
+            if start < t <= stop:
+                events.append(Event(t, k, (sky.names[a], sky.names[b]), value))
+
+    #Alignments: runs of samples with at least min_bodies in an arc of width, one event per run
+    bodies = len(sky.names)
+    if 'alignment' in kinds and min_bodies <= bodies:
+        ordered = np.argsort(longitudes, axis=1)
+        sorted_lon = np.take_along_axis(longitudes, ordered, axis=1)
+        extended = np.concatenate([sorted_lon, sorted_lon + 2 * math.pi], axis=1)
+        spreads = np.stack([extended[:, k - 1:k - 1 + bodies] - sorted_lon for k in range(1, bodies + 1)], axis=1)
+        best = spreads.min(axis=2) #(T, k - 1): smallest arc holding k bodies
+        level = np.sum(best <= width, axis=1) #Most bodies in one arc of width (the arcs grow with k)
+        inside = np.concatenate([[False], level >= min_bodies, [False]])
+        edges = np.flatnonzero(inside[1:] != inside[:-1]).reshape(-1, 2) #[first, last + 1) of every run
+        peaks, groups = [], []
+        for first, last in edges.tolist():
+            top = level[first:last].max()
+            m = first + int(np.argmin(np.where(level[first:last] == top, best[first:last, top - 1], np.inf)))
+            window = int(np.argmin(spreads[m, top - 1]))
+            peaks.append(m)
+            groups.append(ordered[m, (window + np.arange(top)) % bodies])
+        for top in sorted({len(group) for group in groups}):
+            index = [e for e, group in enumerate(groups) if len(group) == top]
+            members = np.array([groups[e] for e in index])
+            rows = np.arange(len(index))[:, None]
+            peak = times[np.array([peaks[e] for e in index])]
+
+            def spread(t):
+                return _spread(sky.longitudes(t)[rows, members])
+
+            best_times = _golden(spread, peak - step, peak + step)
+            values = spread(best_times)
+            for t, group, value in zip(best_times.tolist(), members.tolist(), values.tolist()):
+                if start < t <= stop:
+                    events.append(Event(t, 'alignment', tuple(sky.names[b] for b in group), value))
+    return events
+
+
+class EventList: #Events sorted by time; next/previous/between by binary search
+    def __init__(self, events, epoch, start=None, stop=None):
+        self.events = sorted(events)
+        self.times = np.array([event.time for event in self.events])
+        self.epoch = epoch
+        self.start = start #Searched range in days since the epoch
+        self.stop = stop
+
+    def __len__(self):
+        return len(self.events)
+
+    def __getitem__(self, i):
+        return self.events[i]
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def covers(self, t):
+        return self.start is not None and self.start <= t < self.stop
+
+    def next(self, t): #First event after t, or None
+        i = int(np.searchsorted(self.times, t, side='right'))
+        return self.events[i] if i < len(self.events) else None
+
+    def previous(self, t): #Last event before t, or None
+        i = int(np.searchsorted(self.times, t, side='left'))
+        return self.events[i - 1] if i else None
+
+    def between(self, t0, t1):
+        return self.events[np.searchsorted(self.times, t0, side='left'):np.searchsorted(self.times, t1, side='right')]
+
+    def select(self, kind=None, body=None): #Subset by kind and/or a body taking part
+        return EventList([event for event in self.events if (kind is None or event.kind == kind)
+                          and (body is None or body in event.bodies)], self.epoch, self.start, self.stop)
+
+    def date(self, event):
+        return self.epoch + timedelta(days=event.time)
+
+    def describe(self, event):
+        text = f"{self.date(event).strftime('%Y-%m-%d')}: {KINDS[event.kind]} {' – '.join(event.bodies)}"
+        if event.kind == 'alignment':
+            text += f" (innerhalb {math.degrees(event.value):.0f}°)"
+        return text
+
+
+def find_events(planets_data, epoch, start, end, workers=1, chunk_days=None, **options):
+    #All events between the dates start and end; options as for scan()
+    t0 = (start - epoch).total_seconds() / 86400
+    t1 = (end - epoch).total_seconds() / 86400
+    workers = workers or os.cpu_count() or 1
+    chunk_days = chunk_days or max(365.0, (t1 - t0) / (workers * 4)) #A few chunks per worker
+    bounds = np.append(np.arange(t0, t1, chunk_days), t1).tolist()
+    ranges = list(zip(bounds[:-1], bounds[1:]))
+    events = []
+    if workers == 1 or len(ranges) == 1:
+        for a, b in ranges:
+            events += scan(planets_data, epoch, a, b, **options)
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(scan, planets_data, epoch, a, b, **options) for a, b in ranges]
+            for future in futures:
+                events += future.result()
+    return EventList(events, epoch, t0, t1)
+
+
+def main(argv=None):
+    import catalog
+    parser = argparse.ArgumentParser(description='List conjunctions, oppositions and alignments in a date range')
+    parser.add_argument('--start', default='2025-01-01', help='first date (YYYY-MM-DD)')
+    parser.add_argument('--end', default='2050-01-01', help='last date (YYYY-MM-DD)')
+    parser.add_argument('--observer', default=None, help='body to look from (default: the sun)')
+    parser.add_argument('--kinds', nargs='+', choices=sorted(KINDS), default=sorted(KINDS))
+    parser.add_argument('--body', default=None, help='only events with this body')
+    parser.add_argument('--min-bodies', type=int, default=4, help='bodies in an alignment')
+    parser.add_argument('--width', type=float, default=30, help='arc of an alignment in degrees')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--catalog', default=catalog.DEFAULT_PATH, help='body catalog (.json, .csv or .npy)')
+    args = parser.parse_args(argv)
+
+    planets_data = catalog.load(args.catalog).planets_data('date')
+    started = time.perf_counter()
+    events = find_events(planets_data, catalog.DATE_EPOCH, datetime.strptime(args.start, '%Y-%m-%d'),
+                         datetime.strptime(args.end, '%Y-%m-%d'), workers=args.workers, observer=args.observer,
+                         kinds=args.kinds, min_bodies=args.min_bodies, width=math.radians(args.width))
+    elapsed = time.perf_counter() - started
+    for event in events.select(body=args.body):
+        print(events.describe(event))
+    print(f"{len(events)} events in {elapsed:.2f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
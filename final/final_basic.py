@@ -1,13 +1,30 @@
 from vpython import *
-import math
-import tkinter  #Import tkinter for getting screen size
 import os
 from datetime import datetime, timedelta
+from simulation import DateSimulation
+import catalog
+from nbody import NBodySimulation, BeltPoints
+import ephemeris
+import recording
+import events
+from picking import BodyPicker, camera_from_scene
+from texture_cache import TextureLoader, average_color
+from lod import LODManager
+from scene_graph import SceneGraph, planet_rings
+from attribute_sync import AttributeSync
+from profiler import FrameProfiler
 
-def version_1():
-    root = tkinter.Tk() #Create a Tkinter root window
-    screen_width = root.winfo_screenwidth() #Get screen width (NOT USED IN FINAL VERSION)
-    screen_height = root.winfo_screenheight() #Get screen height (NOT USED IN FINAL VERSION)
+def version_1(screen_size=None, nbody=False, belt_count=1500, workers=1, ephemeris_path=ephemeris.DEFAULT_PATH,
+              catalog_path=catalog.DEFAULT_PATH, profile=False, remote=None,
+              record=None, replay=None, moons=False): #screen_size is accepted for symmetry with version_2 (NOT USED IN FINAL VERSION)
+    #nbody=True: planets and an asteroid belt of belt_count bodies attract each other (workers > 1 splits the force pass over processes)
+    #About 1500 belt bodies stay interactive on one core (~30 ms per force pass); 6000 take ~0.25 s per pass (see nbody.py)
+    #ephemeris_path: precomputed table (final/ephemeris.py), used within its date range if it matches the planet data
+    #catalog_path: body catalog (final/catalog.py), .json, .csv or .npy
+    #profile=True: time each phase of the main loop, show a HUD line and dump the timings with [p]
+    #remote=(host, port): view a broadcast server (final/broadcast.py) instead of simulating locally
+    #record: file to record every frame to (final/recording.py), replay: recording to play back and scrub
+    #moons=True: moons (data/moons.json) and Saturn's ring particles orbiting their planets (final/scene_graph.py)
     scene = canvas(title='3D Solar System (Date-Based with Click Info)', #Create a 3D scene
                     width=1920*1.25, height=1080-50, #Set canvas size, should work for most 16:9 screens
                     center=vector(0, 0, 0),
@@ -15,55 +32,57 @@ def version_1():
                     ambient=vector(0, 0, 0),
                     autoscale=False)
     scene.lights = [] #Clear default lights
-    root.destroy()  #Destroy the tkinter window after getting the size
 
     #sun
     sun = sphere(pos=vector(0, 0, 0), radius=2, color=vector(1, 1, 0), emissive=True) #Create a sun sphere
     sun_light = local_light(pos=sun.pos, color=color.white) #Create light source sun position
 
-    planets_data = [ # List of planets with properties
-        {'name': 'Mercury', 'radius': 0.5, 'orbital_radius': 5,  'orbital_period': 0.240846, 'texture': 'final/textures/mercury.jpg', 'angle_at_start': math.radians(120), 'real_radius_km': 2439.7, 'real_orbital_radius_mio_km': 57.91},
-        {'name': 'Venus',   'radius': 0.8, 'orbital_radius': 8,  'orbital_period': 0.615,     'texture': 'final/textures/venus.jpg',   'angle_at_start': math.radians(250), 'real_radius_km': 6051.8, 'real_orbital_radius_mio_km': 108.2},
-        {'name': 'Earth',   'radius': 1.0, 'orbital_radius': 12, 'orbital_period': 1.0,       'texture': 'final/textures/earth.jpg',   'angle_at_start': math.radians(0),   'real_radius_km': 6371,   'real_orbital_radius_mio_km': 149.6},
-        {'name': 'Mars',    'radius': 0.6, 'orbital_radius': 16, 'orbital_period': 1.8808,    'texture': 'final/textures/mars.jpg',    'angle_at_start': math.radians(45),  'real_radius_km': 3389.5, 'real_orbital_radius_mio_km': 227.9},
-        {'name': 'Jupiter', 'radius': 1.8, 'orbital_radius': 25, 'orbital_period': 11.862,    'texture': 'final/textures/jupyter.jpg', 'angle_at_start': math.radians(90),  'real_radius_km': 69911,  'real_orbital_radius_mio_km': 778.5},
-        {'name': 'Saturn',  'radius': 1.6, 'orbital_radius': 35, 'orbital_period': 29.4571,   'texture': 'final/textures/saturn.jpg',  'angle_at_start': math.radians(180), 'real_radius_km': 58232,  'real_orbital_radius_mio_km': 1434},
-        {'name': 'Uranus',  'radius': 1.2, 'orbital_radius': 48, 'orbital_period': 84.0205,   'texture': 'final/textures/uranus.jpg',  'angle_at_start': math.radians(270), 'real_radius_km': 25362,  'real_orbital_radius_mio_km': 2871},
-        {'name': 'Neptune', 'radius': 1.1, 'orbital_radius': 60, 'orbital_period': 164.8,     'texture': 'final/textures/neptune.jpg', 'angle_at_start': math.radians(315), 'real_radius_km': 24622,  'real_orbital_radius_mio_km': 4495},
-    ]
-
-    #Create rings for each planet
-    for data in planets_data: 
-        ring(pos=vector(0, 0, 0),
-             axis=vector(0, 1, 0),
-             radius=data['orbital_radius'], #Radius of ring
-             thickness=0.1, 
-             color=color.gray(0.3),
-             opacity=0.5) 
+    planets_data = catalog.load(catalog_path).planets_data('date') #List of planets with properties (orbital elements and masses, see data/planets.json)
+
+    #Date simulation (angle_at_start is the position at start_date, the epoch)
+    start_date = catalog.DATE_EPOCH
+    current_date = start_date
+    kepler = DateSimulation(planets_data, start_date) #Headless simulation, this function only renders it
+    sim = kepler
+    if remote is not None: #Viewer only: positions, date and pause state come from the server
+        from broadcast import BroadcastClient, RemoteSimulation
+        sim = RemoteSimulation(BroadcastClient(*remote).start(), planets_data)
+        nbody, belt_count = sim.belt is not None, 0 if sim.belt is None else len(sim.belt)
+        current_date = sim.date
+    elif replay is not None: #Play back a recording, one recorded frame per frame
+        sim = recording.ReplaySimulation(recording.Replay(replay), version=1)
+        nbody, belt_count = sim.belt is not None, 0 if sim.belt is None else len(sim.belt)
+        current_date = sim.date
+    elif nbody: #Gravity between all bodies, started from the Keplerian positions
+        sim = NBodySimulation(kepler, planets_data, belt_count=belt_count, belt_radii=(18, 22), workers=workers)
+    if remote is None and replay is None and ephemeris_path and not (nbody and belt_count): #A table holds the planets only, not the belt
+        table = ephemeris.load(ephemeris_path, planets_data, start_date, model='nbody' if nbody else 'kepler')
+        if table is not None: #Interpolated lookups from the memory-mapped table instead of the model
+            sim = ephemeris.EphemerisSimulation(kepler, table, model=None if sim is kepler else sim) #Outside the table: its model
+
+    #Draw the (elliptical, inclined) orbit of each planet
+    for i in range(len(planets_data)):
+        curve(pos=[vector(x, y, z) for x, y, z in kepler.engine.orbit_path(i).tolist()],
+              radius=0.05,
+              color=color.gray(0.3))
 
     planets = [] #List to hold planet objects
-    angles = [] #List to hold angles of planets
     
     #Create planets
-    for data in planets_data:
-        angle = data['angle_at_start']
-        try: #Try to load texture for planet
-            planet = sphere(pos=vector(data['orbital_radius'] * math.cos(angle),
-                                       0,
-                                       data['orbital_radius'] * math.sin(angle)),
-                            radius=data['radius'], #take data from planets_data
-                            texture=data['texture'],
-                            make_trail=False)
-        except: #If texture not found, create simple sphere
-            planet = sphere(pos=vector(data['orbital_radius'] * math.cos(angle),
-                                       0,
-                                       data['orbital_radius'] * math.sin(angle)),
-                            radius=data['radius'],
-                            color=color.white,
-                            make_trail=False)
+    textures = TextureLoader() #Small placeholder textures first, full resolution swapped in lazily
+    for data, (x, y, z) in zip(planets_data, sim.positions.tolist()):
+        planet = sphere(pos=vector(x, y, z),
+                        radius=data['radius'], #take data from planets_data
+                        color=color.white, #Stays plain white if the texture cannot be loaded
+                        make_trail=False)
+        if 'texture' in data: #Optional in a catalog: without one the planet keeps its color, if any, or white
+            textures.apply(planet, data['texture'])
+        elif 'color' in data:
+            planet.color = vector(*data['color'])
         planet.name = data['name']
         planets.append(planet) #Add planet to list
-        angles.append(angle)
+
+    belt = BeltPoints(sim.belt) if nbody and belt_count else None #Asteroid belt as one points object
 
     #Info label for clicked planet
     info_label = label(pos=vector(0,0,0),
@@ -80,10 +99,6 @@ def version_1():
 
     selected_planet_index = None
 
-    #Date simulation
-    start_date = datetime(2025, 5, 20)
-    current_date = start_date
-
     #UI controls
     time_speed = 50  #Days (frames) per second
     paused = False
@@ -92,65 +107,231 @@ def version_1():
     def slider_callback(s): 
         nonlocal time_speed
         time_speed = s.value
+        if remote is not None: #The server's speed applies to every viewer
+            sim.set_speed(s.value)
 
-    #Pause/Start function (when space is pressed)
+    #Frame profiler (does nothing unless profile=True)
+    profiler = FrameProfiler(enabled=profile)
+
+    #Pause/Start function (when space is pressed), [p] saves the profile
     def handle_keydown(evt):
         nonlocal paused
-        if evt.key == ' ':
+        if evt.key == ' ' and remote is not None: #Pauses the server (and every viewer)
+            sim.toggle_pause()
+        elif evt.key == ' ':
             paused = not paused
+        elif evt.key == 'n':
+            next_event()
+        elif evt.key == 'p' and profile:
+            path = profiler.dump(f'profile_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv')
+            print(f'Profile: {path}')
+
+    #Info text of a planet (built once per planet by the picker, then cached)
+    def planet_info(data): #Lines without a value in the catalog are left out
+        lines = [('Name', data['name'], ''), ('Radius', data.get('real_radius_km'), ' km'),
+                 ('Umlaufzeit', data.get('orbital_period'), ' Jahre'),
+                 ('Abstand zur Sonne', data.get('real_orbital_radius_mio_km'), ' Mio. km'),
+                 ('Exzentrizität', data.get('eccentricity'), '')]
+        return '\n'.join(f"{label}: {value}{unit}" for label, value, unit in lines
+                          if value is not None and value == value) #value == value: not nan
+
+    picker = BodyPicker(planets, planets_data, planet_info, radii=[data['radius'] for data in planets_data])
+    picker.update(sim.positions)
+
+    #Per-frame updates are queued and only sent to the browser if they changed visibly
+    sync = AttributeSync(min_pixels=0.5)
+
+    #Level of detail: textured sphere, plain low-poly sphere or point, by size on screen
+    proxy_colors = [average_color(data['texture']) if 'texture' in data else data.get('color') for data in planets_data]
+    lod = LODManager(planets, [data['radius'] for data in planets_data],
+                     colors=[vector(*c) if c else color.gray(0.7) for c in proxy_colors],
+                     on_proxy=picker.register, sync=sync) #Proxies are clickable as well
+
+    #Moons and ring particles orbit their planets, positioned level by level in batched passes
+    graph = None
+    if moons:
+        moons_data = catalog.load(catalog.MOONS_PATH).planets_data('date', elements=True)
+        graph = SceneGraph(moons_data + planet_rings('date'), [data['name'] for data in planets_data],
+                           period_scale=365.25, angle_key='angle_at_start')
+        graph.update(sim.time, sim.sun, sim.positions)
+        moon_rows, ring_rows = graph.rows[:len(moons_data)], graph.rows[len(moons_data):]
+        moon_spheres = [sphere(pos=vector(x, y, z), radius=data['radius'], color=vector(*data['color']), make_trail=False)
+                        for data, (x, y, z) in zip(moons_data, graph.world[moon_rows].tolist())]
+        moon_lod = LODManager(moon_spheres, [data['radius'] for data in moons_data], sync=sync)
+        rings = BeltPoints(graph.world[ring_rows], radius=1, color=color.gray(0.75))
 
-    #Planet click function (when planet is clicked)
+    def update_moons(camera, moved=True): #moved=False (paused): only level of detail switches
+        if moved:
+            graph.update(sim.time, sim.sun, sim.positions)
+            rings.update(graph.world[ring_rows])
+        moon_lod.update(graph.world[moon_rows], camera, moved=moved)
+
+    #Planet click function (when planet is clicked), O(1) lookup of the clicked object
     def planet_clicked(evt):
         nonlocal selected_planet_index
-        clicked = scene.mouse.pick
-        if clicked and hasattr(clicked, 'name'):
-            for i, planet in enumerate(planets):
-                if planet == clicked:
-                    selected_planet_index = i
-                    data = planets_data[i]
-                    info_label.text = (
-                        f"Name: {data['name']}\n"
-                        f"Radius: {data['real_radius_km']} km\n"
-                        f"Umlaufzeit: {data['orbital_period']} Jahre\n"
-                        f"Abstand zur Sonne: {data['real_orbital_radius_mio_km']} Mio. km"
-                    )
-                    info_label.visible = True 
-                    return
+        i = picker.index_of(scene.mouse.pick)
+        if i is not None:
+            selected_planet_index = i
+            info_label.text = picker.info_text(i)
+            info_label.visible = True
+            return
         selected_planet_index = None
         info_label.visible = False
 
+    #Hover tooltip (when the mouse is near a planet on screen, also if it is too small to click)
+    hovered_planet_index = None
+    hover_label = label(pos=vector(0,0,0),
+                        text='',
+                        yoffset=15,
+                        height=12,
+                        box=False,
+                        line=False,
+                        visible=False,
+                        color=color.white)
+
+    def planet_hovered(evt):
+        nonlocal hovered_planet_index
+        mouse = scene.mouse.pos
+        hovered_planet_index = picker.hover(camera_from_scene(scene), (mouse.x, mouse.y, mouse.z))
+        if hovered_planet_index is None:
+            hover_label.visible = False
+        else:
+            sync.text(hover_label, planets_data[hovered_planet_index]['name'])
+            sync.pos(hover_label, sim.positions[hovered_planet_index].tolist())
+            hover_label.visible = True
+
+    #Jump to any date in O(1) (positions are computed from the date directly)
+    def jump_to(date):
+        show_state(sim.set_date(date))
+
+    def show_state(state): #A state that was not reached by stepping (date jump, scrubbing a replay)
+        nonlocal current_date
+        current_date = state['date']
+        lod.update(state['positions'], camera_from_scene(scene))
+        if belt is not None:
+            belt.update(state['belt'])
+        if graph is not None:
+            update_moons(camera_from_scene(scene))
+        picker.update(state['positions'])
+        sync.text(date_text, f'Date: {current_date.strftime("%Y-%m-%d")}')
+
+    #Next conjunction, opposition or alignment after the shown date (final/events.py); the
+    #search covers event_years ahead and is repeated from the shown date when it runs out
+    event_list = None
+    event_years = 20
+    def next_event(evt=None):
+        nonlocal event_list
+        t = (current_date - start_date).total_seconds() / 86400 + 1 / 86400 #Not the event shown now
+        event = event_list.next(t) if event_list is not None and event_list.covers(t) else None
+        if event is None:
+            event_list = events.find_events(planets_data, start_date, current_date,
+                                            current_date + timedelta(days=365.25 * event_years), workers=workers)
+            event = event_list.next(t)
+        if event is None:
+            sync.text(event_text, f' Keine Ereignisse in {event_years} Jahren')
+            return
+        jump_to(event_list.date(event))
+        sync.text(event_text, ' ' + event_list.describe(event))
+
+    #Scrub function (when the replay slider is moved), decodes at most one chunk of the recording
+    def scrub_callback(s):
+        show_state(sim.seek(int(s.value)))
+
+    #Date input function (when a date is entered)
+    def date_input_callback(evt):
+        try:
+            date = datetime.strptime(evt.text.strip(), "%Y-%m-%d")
+        except ValueError:
+            date_status.text = ' Format: JJJJ-MM-TT'
+            return
+        date_status.text = ''
+        jump_to(date)
+
     #Bind events and UI
     scene.bind('keydown', handle_keydown)
     scene.bind('mousedown', planet_clicked)
+    scene.bind('mousemove', planet_hovered)
 
     #UI elements (text and slider)
     date_text = wtext(text=f'Date: {current_date.strftime("%Y-%m-%d")}')
     scene.append_to_caption('\n\nSimulation Speed (days/sec): ')
     speed_slider = slider(min=0, max=500, value=time_speed, length=300, bind=slider_callback)
-    scene.append_to_caption('\n\n[Leertaste] Pause/Start\n\n')
+    profile_text = wtext(text='') #Profiler HUD (p50/p95 per phase)
+    scene.append_to_caption('\n\nGehe zu Datum (JJJJ-MM-TT): ')
+    date_input = winput(bind=date_input_callback, type='string', width=120)
+    date_status = wtext(text='')
+    scene.append_to_caption('   ')
+    button(text='Nächstes Ereignis', bind=next_event)
+    event_text = wtext(text='')
+    if replay is not None: #Scrub through the recording
+        scene.append_to_caption('\n\nAufnahme: ')
+        scrub_slider = slider(min=0, max=max(1, len(sim.replay) - 1), value=0, length=600, bind=scrub_callback)
+        replay_text = wtext(text='')
+    scene.append_to_caption('\n\n[Leertaste] Pause/Start, [n] Nächstes Ereignis' + (', [p] Profil speichern' if profile else '') + '\n\n')
+    sync_text = wtext(text='') #Traffic saved by the sync layer
+
+    recorder = None
+    if record is not None: #Positions, date and UI state of every frame, starting with the state shown now
+        recorder = recording.recorder_for(record, sim.state(), ui=('paused', 'speed', 'selected'),
+                                          meta={'version': 1, 'epoch': start_date.isoformat(),
+                                                'names': [data['name'] for data in planets_data]})
+        recorder.add_state(sim.state(), paused=paused, speed=time_speed, selected=-1)
 
+    frame = 0
     while True:
+        profiler.frame()
         rate(60)
+        profiler.mark('rate')
+        camera = camera_from_scene(scene) #Read once per frame
+        sync.begin(camera)
+        textures.upgrade() #Swap in at most one full resolution texture per frame
+        profiler.mark('textures')
 
-        if not paused:
+        if paused: #The camera can still move: switch levels of detail where needed
+            lod.update(sim.positions, camera, moved=False)
+            if graph is not None:
+                update_moons(camera, moved=False)
+            profiler.mark('planets')
+        else:
             #Advance time
             days_passed = time_speed / 60  #days per frame
-            current_date += timedelta(days=days_passed) #update current date
+            state = sim.step(days_passed) #positions are evaluated from the absolute date
+            current_date = state['date'] #update current date
+            profiler.mark('simulation')
 
-            #Update planet positions
-            for i, planet in enumerate(planets):
-                period_days = planets_data[i]['orbital_period'] * 365.25
-                angular_velocity = 2 * math.pi / period_days
-                angles[i] += angular_velocity * days_passed
+            #Update planet positions (only the representation visible at its level of detail)
+            lod.update(state['positions'], camera)
+            picker.update(state['positions']) #Hover grid is rebuilt on the next mouse move
+            profiler.mark('planets')
+            if belt is not None:
+                belt.update(state['belt'])
+                profiler.mark('belt')
+            if graph is not None:
+                update_moons(camera)
+                profiler.mark('moons')
 
-                x = planets_data[i]['orbital_radius'] * math.cos(angles[i])
-                z = planets_data[i]['orbital_radius'] * math.sin(angles[i])
-                planet.pos = vector(x, 0, z)
-
-            #Update date display
-            date_text.text = f'Date: {current_date.strftime("%Y-%m-%d")}'
+            #Update date display (only sent when the day changes)
+            sync.text(date_text, f'Date: {current_date.strftime("%Y-%m-%d")}')
 
         #Update info label position if visible
-        if selected_planet_index is not None:
-            selected_planet = planets[selected_planet_index]
-            info_label.pos = selected_planet.pos + vector(0, selected_planet.radius + 2, 0)
+        if selected_planet_index is not None: #From the simulation, hidden representations are not moved
+            x, y, z = sim.positions[selected_planet_index].tolist()
+            sync.pos(info_label, (x, y + planets[selected_planet_index].radius + 2, z))
+        if hovered_planet_index is not None:
+            sync.pos(hover_label, sim.positions[hovered_planet_index].tolist())
+        profiler.mark('labels')
+
+        frame += 1
+        if frame % 60 == 0: #Refresh the counters once a second
+            sync.text(sync_text, sync.stats_text())
+            if profile:
+                sync.text(profile_text, '   ' + profiler.hud_text())
+            if replay is not None: #Position in the recording and the recorded UI state
+                scrub_slider.value = sim.frame
+                sync.text(replay_text, f"   {sim.status_text()}, {sim.ui('speed', 0):.0f} Tage/s"
+                                       + (', pausiert' if sim.ui('paused') else ''))
+        if recorder is not None:
+            recorder.add_state(sim.state(), paused=paused, speed=time_speed,
+                               selected=-1 if selected_planet_index is None else selected_planet_index)
+        sync.flush() #Everything that changed visibly this frame in one pass
+        profiler.mark('sync')
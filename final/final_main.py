@@ -1,17 +1,49 @@
-from final_basic import version_1
-from final_rotate_slider import version_2
+import time
+startup_start = time.perf_counter() #Startup measurement starts before any other import
+import sys
 import tkinter as tk
 
+#The simulation versions (and with them vpython) are imported only when a button is clicked
+
 def start_version_1():
     root.destroy() #Close current window
-    version_1()  #Run version 1
+    from final_basic import version_1
+    version_1(screen_size, nbody=nbody, profile=profile, record=record, replay=replay, moons=moons)  #Run version 1
 
 def start_version_2():
     root.destroy()
-    version_2()  #Run version 2
+    from final_rotate_slider import version_2
+    version_2(screen_size, nbody=nbody, profile=profile, record=record, replay=replay, moons=moons,
+              star_catalog=stars, max_magnitude=max_magnitude)  #Run version 2, reusing the launcher's screen metrics
+
+def start_session():
+    root.destroy()
+    from session import run_session
+    run_session(screen_size)  #Every mode in one scene, switched in place
+
+def report_startup(): #Time from process start until the chooser window is shown
+    startup_ms = (time.perf_counter() - startup_start) * 1000
+    print(f"Launcher startup: {startup_ms:.1f} ms")
+    if '--measure-startup' in sys.argv: #Only measure, then quit (for tracking startup time)
+        root.destroy()
+
+nbody = '--nbody' in sys.argv #Gravitational N-body mode with an asteroid belt
+profile = '--profile' in sys.argv #Frame profiler HUD in the caption, [p] saves the timings
+moons = '--moons' in sys.argv #Moons and Saturn's rings, each orbiting its planet
+
+def option(name): #Value following name on the command line, or None
+    if name in sys.argv[1:-1]:
+        return sys.argv[sys.argv.index(name) + 1]
+    return None
+
+record = option('--record') #Record the session to this file (final/recording.py)
+replay = option('--replay') #Play back a recorded session instead of simulating
+stars = option('--stars') #Bright-star catalog (CSV) for version 2
+max_magnitude = float(option('--max-magnitude') or 6.5) #Faintest catalog stars shown
 
 root = tk.Tk() #Create main window
 root.title("Simulation auswählen") #Set window title
+screen_size = (root.winfo_screenwidth(), root.winfo_screenheight()) #Screen metrics, passed on to the versions
 
 label = tk.Label(root, text="Welche Version möchtest du starten?", font=("Arial", 14))
 label.pack(pady=20) #Add widget to window
@@ -22,4 +54,10 @@ btn1.pack(pady=10)
 btn2 = tk.Button(root, text="Version 2 starten", width=25, height=2, command=start_version_2)
 btn2.pack(pady=10)
 
-root.mainloop() #Start Tkinter loop
\ No newline at end of file
+btn3 = tk.Button(root, text="Alle Modi (Sitzung)", width=25, height=2, command=start_session)
+btn3.pack(pady=10)
+
+root.update_idletasks() #Lay out the window so the measurement includes it
+root.after(0, report_startup) #Runs once the event loop has shown the window
+
+root.mainloop() #Start Tkinter loop
@@ -1,14 +1,36 @@
 from vpython import *
 import math
-import random
-import tkinter  #Import tkinter for getting screen size
 import os
-
-def version_2():
-    root = tkinter.Tk() #Create a Tkinter root window
-    screen_width = root.winfo_screenwidth() #Get screen width
-    screen_height = root.winfo_screenheight() #Get screen height
-    root.destroy()  #Destroy the tkinter window after getting the size
+import time
+import catalog
+import recording
+from simulation import MovingSunSimulation
+from nbody import NBodySimulation, BeltPoints
+from star_field import StarField, generate_star_shell, load_star_catalog, catalog_star_shell
+from trails import CurveTrails
+from texture_cache import TextureLoader, average_color
+from lod import LODManager
+from scene_graph import SceneGraph, planet_rings
+from picking import camera_from_scene
+from clock import FixedStepClock
+from attribute_sync import AttributeSync
+from profiler import FrameProfiler
+
+def version_2(screen_size=None, nbody=False, belt_count=1500, workers=1, catalog_path=catalog.DEFAULT_PATH, profile=False,
+              record=None, replay=None, moons=False, star_catalog=None, max_magnitude=6.5): #screen_size = (width, height), e.g. from the launcher window
+    #nbody=True: planets and an asteroid belt of belt_count bodies attract each other (workers > 1 splits the force pass over processes)
+    #About 1500 belt bodies stay interactive on one core (~30 ms per force pass); 6000 take ~0.25 s per pass (see nbody.py)
+    #catalog_path: body catalog (final/catalog.py), .json, .csv or .npy
+    #profile=True: time each phase of the main loop, show a HUD line and dump the timings with [p]
+    #record: file to record every step to (final/recording.py), replay: recording to play back and scrub
+    #moons=True: moons (data/moons.json) and Saturn's ring particles orbiting their planets (final/scene_graph.py)
+    #star_catalog: bright-star CSV (final/star_field.py) shown down to max_magnitude instead of random stars
+    if screen_size is None: #Only create a Tkinter window if the caller has no screen metrics
+        import tkinter
+        root = tkinter.Tk()
+        screen_size = (root.winfo_screenwidth(), root.winfo_screenheight())
+        root.destroy()
+    screen_width, screen_height = screen_size
 
     scene_width = int(screen_width * 0.985 + 20) #Calculate scene width
     scene_height = int(screen_height * 0.85 + 20) #Calculate scene height
@@ -23,129 +45,201 @@ def version_2():
 
     scene.autospin = False #Disable automatic camera rotation
 
-    class Star: #Define Star class
-        def __init__(self, offset):
-            self.offset = offset
-            self.obj = sphere(pos=offset, radius=1,
-                                color=vector(random.uniform(0.7, 1), random.uniform(0.7, 1), random.uniform(0.7, 1)),
-                                emissive=True, shininess=0)
-
-    def generate_star_shell(radius, count): #Function to generate stars in a spherical shell
-        stars = []
-        for _ in range(count):
-            theta = random.uniform(0, 2 * math.pi)
-            phi = random.uniform(0, math.pi)
-            x = radius * math.sin(phi) * math.cos(theta)
-            y = radius * math.sin(phi) * math.sin(theta)
-            z = radius * math.cos(phi)
-            offset = vector(x, y, z)
-            stars.append(Star(offset))
-        return stars
-
     star_radius = 1500 #Set star shell radius
     num_stars = 2000 #Set number of stars
-    stars = generate_star_shell(radius=star_radius, count=num_stars) #Generate stars
+    if star_catalog is not None: #Real sky, cut at the magnitude limit (cached binary table after the first run)
+        star_offsets, star_colors = catalog_star_shell(load_star_catalog(star_catalog, max_magnitude), star_radius)
+    else:
+        star_offsets, star_colors = generate_star_shell(radius=star_radius, count=num_stars) #Generate stars (seeded)
+    stars = StarField(star_offsets, star_colors) #Whole shell as one batched object
 
     scene.lights = [] #Disable default lighting
 
     sun = sphere(pos=vector(0, 0, 0), radius=2, color=vector(1, 1, 0), emissive=True) #Define the Sun
     sun_light = local_light(pos=sun.pos, color=color.white) #Create light source at sun's position
 
-    planets_data = [ #List of planet data
-        {'name': 'Mercury', 'radius': 0.5, 'orbital_radius': 5, 'orbital_period': 0.88, 'phi_offset': 0,
-         'texture': 'final/textures/mercury.jpg', 'real_radius_km': 2439.7, 'real_orbital_radius_mio_km': 57.91},
-        {'name': 'Venus', 'radius': 0.8, 'orbital_radius': 8, 'orbital_period': 2.25, 'phi_offset': math.pi / 4,
-         'texture': 'final/textures/venus.jpg', 'real_radius_km': 6051.8, 'real_orbital_radius_mio_km': 108.2},
-        {'name': 'Earth', 'radius': 1, 'orbital_radius': 12, 'orbital_period': 3.0, 'phi_offset': math.pi / 2,
-         'texture': 'final/textures/earth.jpg', 'real_radius_km': 6371, 'real_orbital_radius_mio_km': 149.6},
-        {'name': 'Mars', 'radius': 0.6, 'orbital_radius': 16, 'orbital_period': 4.88, 'phi_offset': 3 * math.pi / 4,
-         'texture': 'final/textures/mars.jpg', 'real_radius_km': 3389.5, 'real_orbital_radius_mio_km': 227.9},
-        {'name': 'Jupiter', 'radius': 1.8, 'orbital_radius': 25, 'orbital_period': 12.0, 'phi_offset': math.pi,
-         'texture': 'final/textures/jupyter.jpg', 'real_radius_km': 69911, 'real_orbital_radius_mio_km': 778.5},
-        {'name': 'Saturn', 'radius': 1.6, 'orbital_radius': 35, 'orbital_period': 29.5, 'phi_offset': 5 * math.pi / 4,
-         'texture': 'final/textures/saturn.jpg', 'real_radius_km': 58232, 'real_orbital_radius_mio_km': 1434},
-        {'name': 'Uranus', 'radius': 1.2, 'orbital_radius': 48, 'orbital_period': 84.0, 'phi_offset': 3 * math.pi / 2,
-         'texture': 'final/textures/uranus.jpg', 'real_radius_km': 25362, 'real_orbital_radius_mio_km': 2871},
-        {'name': 'Neptune', 'radius': 1.1, 'orbital_radius': 60, 'orbital_period': 165.0, 'phi_offset': 7 * math.pi / 4,
-         'texture': 'final/textures/neptune.jpg', 'real_radius_km': 24622, 'real_orbital_radius_mio_km': 4495}
-    ]
+    planets_data = catalog.load(catalog_path).planets_data('frame') #List of planet data (mass in sun masses, see data/planets.json)
 
     planets = [] #List to hold planet objects
-    angles = [0] * len(planets_data) #List to hold angles of planets
-
-    for i, data in enumerate(planets_data): #Create planets
-        try: #Try to load texture
-            planet = sphere(
-                pos=vector(data['orbital_radius'], 0, 0),
-                radius=data['radius'],
-                texture=data['texture'],  #Apply the texture
-                make_trail=False,
-                shininess=0
-            )
-            planet.name = data['name']
-            planets.append(planet)
-            angles[i] = 0
-        except Exception as e: #Handle texture loading error
-            print(f"Error loading texture for {data['name']}: {e}")
-            planet = sphere(pos=vector(data['orbital_radius'], 0, 0),
-                             radius=data['radius'],
-                             color=color.white,  #Use white if texture fails
-                             make_trail=False,
-                             shininess=0)
-            planet.name = data['name']
-            planets.append(planet)
-            angles[i] = 0
-
-    time_speed = 60 #Simulation speed
+
+    textures = TextureLoader() #Small placeholder textures first, full resolution swapped in lazily
+    for data in planets_data: #Create planets
+        planet = sphere(pos=vector(data['orbital_radius'], 0, 0),
+                        radius=data['radius'],
+                        color=color.white,  #Stays white if the texture cannot be loaded
+                        make_trail=False,
+                        shininess=0)
+        if 'texture' in data:  #Apply the texture (optional in a catalog)
+            textures.apply(planet, data['texture'])
+        elif 'color' in data:  #No texture: the catalog color, else white
+            planet.color = vector(*data['color'])
+        planet.name = data['name']
+        planets.append(planet)
+
+    sync = AttributeSync(min_pixels=0.5) #Per-frame updates are only sent to the browser if they changed visibly
+
+    #Level of detail: textured sphere, plain low-poly sphere or point, by size on screen
+    proxy_colors = [average_color(data['texture']) if 'texture' in data else data.get('color') for data in planets_data]
+    lod = LODManager(planets, [data['radius'] for data in planets_data],
+                     colors=[vector(*c) if c else color.gray(0.7) for c in proxy_colors], sync=sync)
+
+    time_speed = 60 #Simulation speed (simulated frames per second, the render rate stays at 60 fps)
     horizontal_speed = 0.5 #Sun's horizontal movement speed
     trail_delay_time = 2 #Delay before trails appear
+    trail_max_points = 1000 #Maximum points per trail, older points are dropped
     orbit_angle = math.radians(60.2) #Orbital plane angle
     paused = False #Pause state
 
+    #Headless simulation (time unit: frames), orbital plane tilted by orbit_angle
+    sim = MovingSunSimulation(planets_data, horizontal_speed=horizontal_speed, orbit_angle=orbit_angle)
+    plane = sim.plane #Moons are inclined relative to this plane
+    belt = None
+    if replay is not None: #Play back a recording, one recorded step per clock step (the slider sets the playback speed)
+        sim = recording.ReplaySimulation(recording.Replay(replay), version=2)
+        if sim.belt is not None:
+            belt = BeltPoints(sim.belt)
+    elif nbody: #Gravity between all bodies; the whole system keeps the sun's horizontal motion
+        sim = NBodySimulation(sim, planets_data, belt_count=belt_count, belt_radii=(18, 22), workers=workers)
+        if belt_count:
+            belt = BeltPoints(sim.belt) #Asteroid belt as one points object
+
+    #Moons and ring particles orbit their planets, positioned level by level in batched passes
+    graph = None
+    if moons:
+        moons_data = catalog.load(catalog.MOONS_PATH).planets_data('frame', elements=True)
+        graph = SceneGraph(moons_data + planet_rings('frame'), [data['name'] for data in planets_data],
+                           period_scale=100, offset_key='phi_offset', plane=plane)
+        graph.update(sim.time, sim.sun, sim.positions)
+        moon_rows, ring_rows = graph.rows[:len(moons_data)], graph.rows[len(moons_data):]
+        moon_spheres = [sphere(pos=vector(x, y, z), radius=data['radius'], color=vector(*data['color']),
+                               make_trail=False, shininess=0)
+                        for data, (x, y, z) in zip(moons_data, graph.world[moon_rows].tolist())]
+        moon_lod = LODManager(moon_spheres, [data['radius'] for data in moons_data], sync=sync)
+        rings = BeltPoints(graph.world[ring_rows], radius=1, color=color.gray(0.75))
+
+    def update_moons(camera, t=None): #Around the rendered planets at time t; t=None (paused): only level of detail switches
+        if t is not None:
+            graph.update(t, render_sun, render_positions)
+            rings.update(graph.world[ring_rows])
+        moon_lod.update(graph.world[moon_rows], camera, moved=t is not None)
+
+    profiler = FrameProfiler(enabled=profile) #Frame profiler (does nothing unless profile=True)
+
     def handle_keydown(evt): #Handle keyboard input
         nonlocal paused
         if evt.key == ' ':
             paused = not paused
+        elif evt.key == 'p' and profile: #Save the profile
+            path = profiler.dump(f'profile_{time.strftime("%Y%m%d_%H%M%S")}.csv')
+            print(f'Profile: {path}')
 
     scene.bind('keydown', handle_keydown) #Bind keyboard event
 
+    clock = FixedStepClock(step=1, speed=time_speed, target_fps=60, max_substeps=8) #Fixed steps, decoupled from rendering
+
     def slider_callback(s): #Slider callback function
-        nonlocal time_speed
-        time_speed = s.value  #Link slider value to simulation speed
+        clock.speed = s.value  #Link slider value to simulated time per second (not to the frame rate)
 
     scene.append_to_caption('\n\nSimulation Speed: ') #Add text to scene caption
     speed_slider = slider(min=1, max=100, value=time_speed, length=300, bind=slider_callback, vertical=False) #Create speed slider
-    scene.append_to_caption('\n\nPause/Start = Leertaste') #Add pause instruction
+    profile_text = wtext(text='') #Profiler HUD (p50/p95 per phase)
+
+    def scrub_callback(s): #Jump within the recording (decodes at most one chunk), trails restart there
+        nonlocal previous_time
+        sim.seek(int(s.value))
+        previous_time = sim.time
+        for array, value in ((previous_sun, sim.sun), (render_sun, sim.sun),
+                             (previous_positions, sim.positions), (render_positions, sim.positions)):
+            array[:] = value
+        trails.clear()
+        for obj in (sun, sun_light):
+            sync.pos(obj, sim.sun.tolist())
+        sync.pos(stars.obj, sim.sun.tolist(), stars.attribute)
+
+    if replay is not None:
+        scene.append_to_caption('\n\nAufnahme: ')
+        scrub_slider = slider(min=0, max=max(1, len(sim.replay) - 1), value=0, length=600, bind=scrub_callback)
+        replay_text = wtext(text='')
+    scene.append_to_caption('\n\nPause/Start = Leertaste' + (', Profil speichern = p' if profile else '')) #Add pause instruction
     scene.append_to_caption('\n\n')
+    sync_text = wtext(text='') #Traffic saved by the sync layer
 
     t = 0 #Initialize time counter
     trail_started = False #Flag for trails
+    trails = CurveTrails(planets, max_points=trail_max_points) #Bounded, decimated trails
 
-    while True: #Main simulation loop
-        rate(max(1, time_speed)) #Set simulation rate
+    previous_time = sim.time #State before the last step, for interpolated rendering
+    previous_sun = sim.sun.copy()
+    previous_positions = sim.positions.copy()
+    render_sun = sim.sun.copy()
+    render_positions = sim.positions.copy()
 
-        if not paused:
-            sun.pos.x += horizontal_speed #Move sun horizontally
-            sun_light.pos = sun.pos #Update sun light position
-            scene.camera.follow(sun) #Camera follows the sun
+    scene.camera.follow(sun) #Camera follows the sun (persistent, set once instead of every frame)
 
-            for star in stars: #Move stars to follow sun
-                star.obj.pos = sun.pos + star.offset
+    recorder = None
+    if record is not None: #Positions and speed of every simulation step, starting with the state shown now
+        recorder = recording.recorder_for(record, sim.state(), ui=('speed',),
+                                          meta={'version': 2, 'names': [data['name'] for data in planets_data]})
+        recorder.add_state(sim.state(), speed=clock.speed)
 
-            for i, planet in enumerate(planets): #Move planets
-                data = planets_data[i]
-                angular_velocity = 2 * math.pi / (data['orbital_period'] * 100) #Calculate angular velocity
-                angles[i] += angular_velocity #Update planet angle
-
-                z_orbit = data['orbital_radius'] * math.cos(angles[i] + data['phi_offset']) #Calculate Z position
-                y_orbit = data['orbital_radius'] * math.sin(angles[i] + data['phi_offset']) * math.sin(orbit_angle) #Calculate Y position
-                x_orbit = data['orbital_radius'] * math.sin(angles[i] + data['phi_offset']) * math.cos(orbit_angle) #Calculate X position
-
-                planet.pos = sun.pos + vector(x_orbit, y_orbit, z_orbit) #Set planet position
-
-            if not trail_started and t * (1 / time_speed) >= trail_delay_time: #Enable trails after delay to avoid startup clatter
-                for planet in planets:
-                    planet.make_trail = True
+    frame = 0
+    while True: #Main simulation loop
+        profiler.frame()
+        rate(clock.target_fps) #Steady render rate, whatever the simulation speed
+        profiler.mark('rate')
+        camera = camera_from_scene(scene) #Read once per frame
+        sync.begin(camera)
+        textures.upgrade() #Swap in at most one full resolution texture per frame
+        profiler.mark('textures')
+
+        steps = clock.tick(running=not paused) #Fixed steps owed for the real time that passed
+        for _ in range(steps):
+            previous_time = sim.time
+            previous_sun[:] = sim.sun
+            previous_positions[:] = sim.positions
+            state = sim.step(clock.step) #Advance sun and planets one fixed step
+            if recorder is not None:
+                recorder.add_state(state, speed=clock.speed)
+            profiler.mark('simulation')
+
+            if not trail_started and t * (1 / max(1, clock.speed)) >= trail_delay_time: #Enable trails after delay to avoid startup clatter
                 trail_started = True
-
-            t += 1 #Increment time counter
\ No newline at end of file
+            if trail_started:
+                trails.push(state['positions']) #Extend trails (fixed memory however long it runs)
+                profiler.mark('trails')
+
+            t += 1 #Increment time counter
+
+        if paused: #The camera can still move: switch levels of detail where needed
+            lod.update(render_positions, camera, moved=False)
+            if graph is not None:
+                update_moons(camera)
+            profiler.mark('planets')
+        else: #Render between the last two steps, so slow speeds still move smoothly
+            clock.interpolate(previous_sun, sim.sun, out=render_sun)
+            clock.interpolate(previous_positions, sim.positions, out=render_positions)
+            sun_xyz = render_sun.tolist()
+            sync.pos(sun, sun_xyz) #Move sun horizontally
+            sync.pos(sun_light, sun_xyz) #Update sun light position
+            sync.pos(stars.obj, sun_xyz, stars.attribute) #Move star shell with the sun in one update (as stars.follow)
+            profiler.mark('stars')
+
+            lod.update(render_positions, camera) #Move planets (only what is visible at its level of detail)
+            profiler.mark('planets')
+            if belt is not None and steps:
+                belt.update(sim.belt)
+                profiler.mark('belt')
+            if graph is not None:
+                update_moons(camera, float(clock.interpolate(previous_time, sim.time)))
+                profiler.mark('moons')
+
+        frame += 1
+        if frame % 60 == 0: #Refresh the counters once a second
+            sync.text(sync_text, sync.stats_text())
+            if profile:
+                sync.text(profile_text, '   ' + profiler.hud_text())
+            if replay is not None: #Position in the recording and the recorded speed
+                scrub_slider.value = sim.frame
+                sync.text(replay_text, f"   {sim.status_text()}, Geschwindigkeit {sim.ui('speed', 0):.0f}")
+        sync.flush() #Everything that changed visibly this frame in one pass
+        profiler.mark('sync')
@@ -0,0 +1,84 @@
+import math
+import numpy as np
+from orbit_engine import OrbitEngine
+
+#Keplerian orbits: eccentricity, inclination, ascending node and perihelion for every
+#body, with Kepler's equation solved for all bodies at once by vectorized Newton steps.
+
+def solve_kepler(mean_anomaly, eccentricity, tol=1e-10, max_iter=12):
+    #Eccentric anomaly E with E - e*sin(E) = M for arrays of M and e (elliptic orbits, e < 1)
+    M = np.remainder(mean_anomaly + math.pi, 2 * math.pi) - math.pi #Wrap to [-pi, pi)
+    e = np.broadcast_to(eccentricity, M.shape)
+    if not e.any(): #Circular orbits (moons, ring particles): E = M
+        return M
+    E = np.where(e < 0.8, M, np.copysign(math.pi, M)) #Starting guess that converges for all e < 1
+    for _ in range(max_iter): #Convergence cap: never more than max_iter passes
+        step = (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+        E -= step
+        if np.max(np.abs(step), initial=0.0) < tol:
+            break
+    return E
+
+def orientation(inclination, ascending_node, perihelion):
+    #Unit vectors P (towards perihelion) and Q (90 degrees ahead in the orbit) in scene
+    #coordinates; perihelion is the longitude of perihelion. The ecliptic is the x-z plane
+    #(scene y = ecliptic z), matching the circular orbits x = r*cos(a), z = r*sin(a).
+    w = perihelion - ascending_node #Argument of perihelion
+    cos_w, sin_w = np.cos(w), np.sin(w)
+    cos_n, sin_n = np.cos(ascending_node), np.sin(ascending_node)
+    cos_i, sin_i = np.cos(inclination), np.sin(inclination)
+    P = np.stack([cos_w * cos_n - sin_w * sin_n * cos_i,
+                  sin_w * sin_i,
+                  cos_w * sin_n + sin_w * cos_n * cos_i], axis=-1)
+    Q = np.stack([-sin_w * cos_n - cos_w * sin_n * cos_i,
+                  cos_w * sin_i,
+                  -sin_w * sin_n + cos_w * cos_n * cos_i], axis=-1)
+    return P, Q
+
+
+class KeplerEngine(OrbitEngine): #Elliptical, inclined orbits; angles are mean longitudes
+    def __init__(self, orbital_radius, angular_velocity, angle, angle_offset=None, eccentricity=0.0,
+                 inclination=0.0, ascending_node=0.0, perihelion=0.0, tol=1e-10, max_iter=12):
+        n = len(orbital_radius)
+        self.eccentricity = np.broadcast_to(np.asarray(eccentricity, dtype=np.float64), (n,)).copy()
+        self.perihelion = np.broadcast_to(np.asarray(perihelion, dtype=np.float64), (n,)).copy()
+        self.P, self.Q = orientation(np.broadcast_to(inclination, (n,)), np.broadcast_to(ascending_node, (n,)),
+                                     self.perihelion)
+        self.tol = tol
+        self.max_iter = max_iter
+        super().__init__(orbital_radius, angular_velocity, angle, angle_offset=angle_offset)
+
+    @classmethod
+    def from_planets(cls, planets_data, period_scale, angle_key=None, offset_key=None, **kwargs):
+        #Missing orbital elements default to 0, i.e. the circular orbits of the other modes
+        for key in ['eccentricity', 'inclination', 'ascending_node', 'perihelion']:
+            kwargs.setdefault(key, [data.get(key, 0.0) for data in planets_data])
+        return super().from_planets(planets_data, period_scale, angle_key, offset_key, **kwargs)
+
+    def _positions(self, mean_longitude, out=None): #Positions on the ellipses for given mean longitudes
+        E = solve_kepler(mean_longitude - self.perihelion, self.eccentricity, self.tol, self.max_iter)
+        a = self.orbital_radius
+        x = a * (np.cos(E) - self.eccentricity) #In the orbital plane, perihelion along P
+        y = a * np.sqrt(1 - self.eccentricity ** 2) * np.sin(E)
+        if out is None:
+            out = np.empty(x.shape + (3,))
+        np.multiply(x[..., None], self.P, out=out)
+        out += y[..., None] * self.Q
+        return out
+
+    def _phase_positions(self, phase): #Mean longitudes of any shape (..., n)
+        return self._positions(phase)
+
+    def update_positions(self):
+        return self._positions(self.angles + self.angle_offset, out=self.positions)
+
+    def positions_at(self, t):
+        return self._positions(self.start_angles + self.angular_velocity * t + self.angle_offset)
+
+    def orbit_path(self, i, samples=180): #Points along the full ellipse of body i (for drawing the orbit)
+        E = np.linspace(0, 2 * math.pi, samples + 1)
+        a = self.orbital_radius[i]
+        e = self.eccentricity[i]
+        x = a * (np.cos(E) - e)
+        y = a * math.sqrt(1 - e ** 2) * np.sin(E)
+        return np.multiply.outer(x, self.P[i]) + np.multiply.outer(y, self.Q[i])
@@ -0,0 +1,81 @@
+import numpy as np
+from picking import project
+
+#Level of detail by projected size: every body is drawn as its full (textured) sphere,
+#as an untextured low-poly simple_sphere, or as one point of a single shared points
+#object. Switching uses hysteresis around each threshold, so bodies near a threshold
+#do not flicker between levels. Only the active representation gets position updates.
+
+FULL, SIMPLE, POINT = 0, 1, 2
+
+class LODManager:
+    def __init__(self, objects, radii, colors=None, thresholds=(12, 2), hysteresis=0.25,
+                 point_radius=2, on_proxy=None, sync=None):
+        from vpython import simple_sphere, points, vector #Imported here so the module loads headless
+        self._simple_sphere = simple_sphere
+        self._vector = vector
+        self.objects = objects #Full representation (may carry a texture)
+        self.radii = np.asarray(radii, dtype=np.float64)
+        self.colors = colors if colors is not None else [obj.color for obj in objects] #Proxy colors (vectors)
+        self.thresholds = thresholds #Projected radius in pixels: FULL above the first, POINT below the second
+        self.hysteresis = hysteresis #Relative margin around each threshold before switching
+        self.on_proxy = on_proxy #Called as on_proxy(proxy, i) when a low-poly proxy is created (e.g. for picking)
+        self.sync = sync #Optional AttributeSync: positions are queued and only sent if they moved visibly
+        self.levels = np.full(len(objects), FULL, dtype=np.int8)
+        self.proxies = [None] * len(objects) #simple_sphere per body, created the first time it is needed
+        self.points = points(radius=point_radius)
+        self._drawn_points = 0
+        self.switches = 0 #Level changes so far
+
+    def _level(self, pixels, scale): #Level for projected radii with thresholds scaled by scale
+        full, point = self.thresholds
+        return np.where(pixels >= full * scale, FULL, np.where(pixels >= point * scale, SIMPLE, POINT)).astype(np.int8)
+
+    def _show(self, i, level, visible):
+        if level == FULL:
+            self.objects[i].visible = visible
+        elif level == SIMPLE:
+            proxy = self.proxies[i]
+            if proxy is None:
+                if not visible:
+                    return
+                obj = self.objects[i]
+                proxy = self.proxies[i] = self._simple_sphere(pos=obj.pos, radius=obj.radius, color=self.colors[i])
+                if self.on_proxy is not None:
+                    self.on_proxy(proxy, i)
+            proxy.visible = visible
+
+    def update(self, positions, camera, moved=True): #Choose levels for this frame and move the visible representations
+        #moved=False (e.g. paused while the camera moves): only bodies that change level are positioned
+        _, _, inv = project(positions, camera)
+        pixels = np.nan_to_num(self.radii * inv) #Behind the camera counts as 0 pixels
+        #Coarsen only below threshold * (1 - h), refine only above threshold * (1 + h)
+        coarsest = self._level(pixels, 1 + self.hysteresis)
+        finest = self._level(pixels, 1 - self.hysteresis)
+        levels = np.clip(self.levels, finest, coarsest)
+        changed = levels != self.levels
+        for i in np.flatnonzero(changed).tolist():
+            self._show(i, int(self.levels[i]), False)
+            self._show(i, int(levels[i]), True)
+            self.switches += 1
+        self.levels = levels
+
+        vector = self._vector
+        coordinates = positions.tolist()
+        active = np.ones(len(levels), dtype=bool) if moved else changed
+        for i in np.flatnonzero(active & (levels != POINT)).tolist():
+            obj = self.objects[i] if levels[i] == FULL else self.proxies[i]
+            if self.sync is not None:
+                self.sync.pos(obj, coordinates[i])
+            else:
+                obj.pos = vector(*coordinates[i])
+        far = np.flatnonzero(levels == POINT).tolist()
+        if (far or self._drawn_points) and (moved or changed.any()): #All point-sized bodies in one update
+            self.points.clear()
+            if far:
+                self.points.append([{'pos': vector(*coordinates[i]), 'color': self.colors[i]} for i in far])
+            self._drawn_points = len(far)
+        return self.levels
+
+    def counts(self): #Bodies per level (FULL, SIMPLE, POINT)
+        return np.bincount(self.levels, minlength=3)
@@ -0,0 +1,78 @@
+import math
+import numpy as np
+
+#Orbit engine: all orbital elements live in contiguous numpy arrays, so every
+#body is advanced and positioned in one batched step per frame
+
+class OrbitEngine:
+    def __init__(self, orbital_radius, angular_velocity, angle, angle_offset=None,
+                 axis_u=(1, 0, 0), axis_v=(0, 0, 1)):
+        self.orbital_radius = np.asarray(orbital_radius, dtype=np.float64) #Radius of each orbit
+        self.angular_velocity = np.asarray(angular_velocity, dtype=np.float64) #Radians per time unit
+        self.angles = np.array(angle, dtype=np.float64) #Current angle of each body (copy, updated in place)
+        self.start_angles = self.angles.copy() #Angle of each body at time 0 (the epoch)
+        self.time = 0.0 #Time since the epoch in the engine's time unit
+        if angle_offset is None:
+            angle_offset = np.zeros_like(self.angles)
+        self.angle_offset = np.asarray(angle_offset, dtype=np.float64) #Constant phase added to the angle
+
+        #Orbital plane: position = r * (cos(a) * u + sin(a) * v)
+        self.axis_u = np.asarray(axis_u, dtype=np.float64)
+        self.axis_v = np.asarray(axis_v, dtype=np.float64)
+
+        n = len(self.orbital_radius)
+        self.positions = np.zeros((n, 3)) #x/y/z of every body, rewritten in place
+        self._cos = np.empty(n) #Scratch buffers to avoid allocations per frame
+        self._sin = np.empty(n)
+        self._phase = np.empty(n)
+        self._offset = np.empty((n, 3))
+        self.update_positions()
+
+    @classmethod
+    def from_planets(cls, planets_data, period_scale, angle_key=None, offset_key=None, **kwargs):
+        #period_scale converts 'orbital_period' into the time unit used by advance()
+        radius = [data['orbital_radius'] for data in planets_data]
+        angular_velocity = [2 * math.pi / (data['orbital_period'] * period_scale) for data in planets_data]
+        angle = [data[angle_key] if angle_key else 0.0 for data in planets_data]
+        offset = [data[offset_key] for data in planets_data] if offset_key else None
+        return cls(radius, angular_velocity, angle, angle_offset=offset, **kwargs)
+
+    def __len__(self):
+        return len(self.orbital_radius)
+
+    def advance(self, dt): #Advance every body by dt time units
+        self.time += dt
+        self.angles += self.angular_velocity * dt
+        self.update_positions()
+        return self.positions
+
+    def set_time(self, t): #Closed form: angles straight from the time since the epoch, no accumulated error
+        self.time = t
+        np.multiply(self.angular_velocity, t, out=self.angles)
+        self.angles += self.start_angles
+        self.update_positions()
+        return self.positions
+
+    def positions_at(self, t): #Positions at time t without touching the current state
+        phase = self.start_angles + self.angular_velocity * t + self.angle_offset
+        return (np.multiply.outer(self.orbital_radius * np.cos(phase), self.axis_u)
+                + np.multiply.outer(self.orbital_radius * np.sin(phase), self.axis_v))
+
+    def positions_batch(self, times): #Positions (T, n, 3) at many times in one pass, state unchanged
+        phase = self.start_angles + np.multiply.outer(np.asarray(times, dtype=np.float64), self.angular_velocity) + self.angle_offset
+        return self._phase_positions(phase)
+
+    def _phase_positions(self, phase): #Positions for phases of any shape (..., n)
+        return ((self.orbital_radius * np.cos(phase))[..., None] * self.axis_u
+                + (self.orbital_radius * np.sin(phase))[..., None] * self.axis_v)
+
+    def update_positions(self): #Recompute x/y/z from the current angles
+        np.add(self.angles, self.angle_offset, out=self._phase)
+        np.cos(self._phase, out=self._cos)
+        np.sin(self._phase, out=self._sin)
+        self._cos *= self.orbital_radius
+        self._sin *= self.orbital_radius
+        np.multiply.outer(self._cos, self.axis_u, out=self.positions)
+        np.multiply.outer(self._sin, self.axis_v, out=self._offset)
+        self.positions += self._offset
+        return self.positions
@@ -0,0 +1,113 @@
+import math
+import numpy as np
+
+#Picking and hover inspection: clicked objects map to their body in O(1) through an
+#id index, info texts are built once per body, and hovering uses a uniform grid over
+#the projected screen positions, so bodies too small to click can still be inspected.
+
+def camera_from_scene(scene): #Camera of a vpython canvas as plain numbers (position, forward, up, fov, size)
+    c, f, u = scene.camera.pos, scene.forward, scene.up
+    return ((c.x, c.y, c.z), (f.x, f.y, f.z), (u.x, u.y, u.z), scene.fov, (scene.width, scene.height))
+
+def camera_basis(camera): #Orthonormal (right, up, forward) of a camera
+    _, forward, up, _, _ = camera
+    forward = np.asarray(forward, dtype=np.float64)
+    forward = forward / np.linalg.norm(forward)
+    right = np.cross(forward, up)
+    right /= np.linalg.norm(right)
+    return right, np.cross(right, forward), forward
+
+def project(positions, camera): #Pixel coordinates (x right, y down) and depth of many points
+    eye, _, _, fov, (width, height) = camera
+    right, up, forward = camera_basis(camera)
+    rel = np.asarray(positions, dtype=np.float64) - eye
+    depth = rel @ forward
+    scale = min(width, height) / 2 / math.tan(fov / 2) #Pixels per unit at depth 1 (fov spans the shorter side)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv = np.where(depth > 0, scale / depth, np.nan) #Points behind the camera have no screen position
+    screen = np.empty((len(rel), 2))
+    screen[:, 0] = width / 2 + (rel @ right) * inv
+    screen[:, 1] = height / 2 - (rel @ up) * inv
+    return screen, depth, inv
+
+
+class ScreenGrid: #Uniform grid over screen positions: hover queries only look at nearby cells
+    def __init__(self, screen, cell=32):
+        self.cell = cell
+        self.screen = screen
+        valid = np.flatnonzero(np.isfinite(screen).all(axis=1))
+        cells = np.floor(screen[valid] / cell).astype(np.int64)
+        keys = cells[:, 0] * 1000003 + cells[:, 1]
+        order = np.argsort(keys, kind='stable')
+        self.indices = valid[order]
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+        self.cells = {int(k): (int(s), int(e)) for k, s, e in zip(keys[starts], starts, ends)}
+
+    def nearest(self, x, y, max_distance, extra=None): #Closest index within max_distance (+ extra[i]) pixels, or None
+        reach = max_distance + (float(np.max(extra)) if extra is not None and len(extra) else 0.0)
+        span = int(math.ceil(reach / self.cell))
+        cx, cy = int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+        if (2 * span + 1) ** 2 >= len(self.cells): #Large reach (a huge body up close): cheaper to test all
+            candidates = self.indices
+        else:
+            found = []
+            for i in range(cx - span, cx + span + 1):
+                for j in range(cy - span, cy + span + 1):
+                    bounds = self.cells.get(i * 1000003 + j)
+                    if bounds:
+                        found.append(self.indices[bounds[0]:bounds[1]])
+            if not found:
+                return None
+            candidates = np.concatenate(found)
+        distance = np.hypot(self.screen[candidates, 0] - x, self.screen[candidates, 1] - y)
+        limit = max_distance + (extra[candidates] if extra is not None else 0.0)
+        inside = distance <= limit
+        if not inside.any():
+            return None
+        return int(candidates[inside][np.argmin(distance[inside])])
+
+
+class BodyPicker: #Object -> body index, cached info texts and screen-space hover lookup
+    def __init__(self, objects, planets_data, describe, radii=None, hover_distance=8, cell=32):
+        self.planets_data = planets_data
+        self.describe = describe #describe(data) -> info text, called at most once per body
+        self.index = {id(obj): i for i, obj in enumerate(objects)}
+        self.radii = np.asarray(radii if radii is not None else [0.0] * len(planets_data), dtype=np.float64)
+        self.hover_distance = hover_distance #Pixels around a body (beyond its drawn size) that count as hovering
+        self.cell = cell
+        self._texts = [None] * len(planets_data)
+        self._positions = None
+        self._grid = None
+        self._pixel_radii = None
+
+    def register(self, obj, i): #Another object drawing body i (e.g. a level of detail proxy)
+        self.index[id(obj)] = i
+
+    def index_of(self, obj): #O(1), whatever the number of bodies
+        return self.index.get(id(obj)) if obj is not None else None
+
+    def info_text(self, i):
+        text = self._texts[i]
+        if text is None:
+            text = self._texts[i] = self.describe(self.planets_data[i])
+        return text
+
+    def update(self, positions): #New positions this frame; the grid is rebuilt lazily on the next hover query
+        self._positions = positions
+        self._grid = None
+
+    def hover(self, camera, mouse): #Body under the mouse (a scene point, e.g. scene.mouse.pos) or None
+        if self._positions is None:
+            return None
+        if self._grid is None or self._grid_camera != camera:
+            screen, depth, inv = project(self._positions, camera)
+            self._grid = ScreenGrid(screen, self.cell)
+            self._pixel_radii = np.nan_to_num(self.radii * inv)
+            self._grid_camera = camera
+        screen, _, _ = project(np.asarray([mouse], dtype=np.float64), camera)
+        x, y = screen[0]
+        if not (np.isfinite(x) and np.isfinite(y)):
+            return None
+        return self._grid.nearest(x, y, self.hover_distance, self._pixel_radii)
@@ -0,0 +1,85 @@
+import csv
+import time
+import numpy as np
+
+#Frame profiler: the main loops call frame() once per frame and mark(phase) after each
+#phase, which costs one timer call and a list update. The last size frames are kept in a
+#ring buffer for rolling percentiles, shown as one HUD line and dumped to CSV on request.
+
+class FrameProfiler:
+    def __init__(self, size=600, enabled=True, timer=None):
+        self.size = size #Frames kept for the percentiles
+        self.enabled = enabled #Disabled: every call returns at once
+        self.timer = timer or time.perf_counter
+        self.phases = [] #Phase names in the order they were first marked
+        self._index = {}
+        self.samples = np.zeros((size, 8)) #Seconds per frame and phase (columns grow with the phases)
+        self.frames = 0 #Completed frames
+        self._current = None #Times of the running frame
+        self._last = None
+
+    def _column(self, phase):
+        j = self._index.get(phase)
+        if j is None:
+            j = self._index[phase] = len(self.phases)
+            self.phases.append(phase)
+            if j >= self.samples.shape[1]:
+                self.samples = np.hstack([self.samples, np.zeros_like(self.samples)])
+            if self._current is not None:
+                self._current.append(0.0)
+        return j
+
+    def frame(self): #Call at the top of the main loop: closes the previous frame, starts the next
+        if not self.enabled:
+            return
+        now = self.timer()
+        if self._current is not None:
+            self._current[self._column('other')] += now - self._last #Time after the last mark
+            row = self.samples[self.frames % self.size]
+            row[:] = 0
+            row[:len(self._current)] = self._current
+            self.frames += 1
+        self._current = [0.0] * len(self.phases)
+        self._last = now
+
+    def mark(self, phase): #Time since the previous mark (or the frame start) is added to phase
+        if not self.enabled or self._current is None:
+            return
+        now = self.timer()
+        self._current[self._column(phase)] += now - self._last
+        self._last = now
+
+    def recent(self): #(frames, phases) seconds of the frames in the ring buffer, oldest first
+        if self.frames >= self.size: #Full: the oldest frame is the next one to be overwritten
+            rows = np.roll(self.samples, -(self.frames % self.size), axis=0)
+        else:
+            rows = self.samples[:self.frames]
+        return rows[:, :len(self.phases)]
+
+    def percentiles(self, q=(50, 95, 99)): #Phase (and 'frame' for the whole frame) -> milliseconds at each q
+        rows = self.recent()
+        if not len(rows):
+            return {}
+        values = np.percentile(rows * 1000, q, axis=0)
+        result = {phase: tuple(values[:, j].tolist()) for j, phase in enumerate(self.phases)}
+        result['frame'] = tuple(np.percentile(rows.sum(axis=1) * 1000, q).tolist())
+        return result
+
+    def hud_text(self, top=4): #One line: frame time and the slowest phases (p50 / p95 in ms)
+        stats = self.percentiles((50, 95))
+        if not stats:
+            return ''
+        frame = stats.pop('frame')
+        slowest = sorted(stats.items(), key=lambda item: -item[1][1])[:top]
+        parts = [f'{phase} {p50:.1f}/{p95:.1f}' for phase, (p50, p95) in slowest]
+        return f'Frame {frame[0]:.1f}/{frame[1]:.1f} ms ({1000 / frame[0] if frame[0] else 0:.0f} fps) | ' + ' | '.join(parts)
+
+    def dump(self, path): #Frames in the ring buffer as CSV (milliseconds), one row per frame
+        rows = self.recent() * 1000
+        first = self.frames - len(rows)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame'] + self.phases + ['total'])
+            for i, row in enumerate(rows.tolist()):
+                writer.writerow([first + i] + [f'{v:.3f}' for v in row] + [f'{sum(row):.3f}'])
+        return path
@@ -0,0 +1,104 @@
+import struct
+import zlib
+import numpy as np
+
+#Software rasterizer for headless export: shaded spheres, one pixel wide polylines and
+#point stars into an 8 bit RGB image, written as PNG with zlib only. Screen coordinates
+#come from picking.project (x right, y down); nan marks points behind the camera.
+
+class Rasterizer:
+    def __init__(self, width, height, background=(0, 0, 0)):
+        self.width = width
+        self.height = height
+        self.background = to_bytes(background)
+        self.image = np.empty((height, width, 3), dtype=np.uint8) #8 bit throughout: whole-image passes are the cost per frame
+        self.clear()
+
+    def clear(self):
+        if self.background.any():
+            self.image[:] = self.background
+        else:
+            self.image.fill(0)
+
+    def _pixels(self, screen): #Integer pixel coordinates of the points that land on the image
+        screen = np.asarray(screen, dtype=np.float64)
+        inside = np.all(np.isfinite(screen), axis=1)
+        xy = np.floor(screen[inside]).astype(np.int64)
+        on_image = (xy[:, 0] >= 0) & (xy[:, 0] < self.width) & (xy[:, 1] >= 0) & (xy[:, 1] < self.height)
+        mask = np.zeros(len(screen), dtype=bool)
+        mask[np.flatnonzero(inside)[on_image]] = True
+        return xy[on_image], mask
+
+    def points(self, screen, colors, size=1): #One size x size square per point (e.g. stars)
+        xy, mask = self._pixels(screen)
+        colors = np.broadcast_to(to_bytes(colors), (len(mask), 3))[mask]
+        for dy in range(size):
+            for dx in range(size):
+                x = np.minimum(xy[:, 0] + dx, self.width - 1)
+                y = np.minimum(xy[:, 1] + dy, self.height - 1)
+                self.image[y, x] = colors
+
+    def polyline(self, screen, color): #Connected segments, sampled once per pixel of length
+        screen = np.asarray(screen, dtype=np.float64)
+        if len(screen) < 2:
+            return
+        p0 = screen[:-1]
+        p1 = screen[1:]
+        valid = np.all(np.isfinite(p0), axis=1) & np.all(np.isfinite(p1), axis=1)
+        p0 = p0[valid]
+        delta = p1[valid] - p0
+        #Segments reaching far off the image (points close to the camera) are capped
+        samples = np.minimum(np.ceil(np.abs(delta).max(axis=1)), self.width + self.height).astype(np.int64) + 1
+        segment = np.repeat(np.arange(len(p0)), samples)
+        offset = np.arange(len(segment)) - np.repeat(np.cumsum(samples) - samples, samples)
+        f = offset / np.repeat(np.maximum(samples - 1, 1), samples)
+        xy, _ = self._pixels(p0[segment] + delta[segment] * f[:, None])
+        self.image[xy[:, 1], xy[:, 0]] = to_bytes(color)
+
+    def sphere(self, x, y, radius, color, light=None): #Disc at (x, y); light = direction to the light in (right, up, towards viewer), None = emissive
+        color = np.asarray(color, dtype=np.float32)
+        if radius < 0.5: #Smaller than a pixel: one dot
+            if 0 <= x < self.width and 0 <= y < self.height:
+                self.image[int(y), int(x)] = to_bytes(color)
+            return
+        x0 = max(int(np.floor(x - radius)), 0)
+        x1 = min(int(np.ceil(x + radius)) + 1, self.width)
+        y0 = max(int(np.floor(y - radius)), 0)
+        y1 = min(int(np.ceil(y + radius)) + 1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        dx = (np.arange(x0, x1, dtype=np.float32) + 0.5 - x) / radius
+        dy = (np.arange(y0, y1, dtype=np.float32) + 0.5 - y) / radius
+        r2 = dx[None, :] ** 2 + dy[:, None] ** 2
+        inside = r2 <= 1
+        if light is None:
+            shade = np.ones_like(r2)
+        else: #Lambert shading with the normal of the visible hemisphere (screen y points down)
+            lx, ly, lz = light
+            nz = np.sqrt(np.maximum(1 - r2, 0))
+            shade = np.clip(dx[None, :] * lx - dy[:, None] * ly + nz * lz, 0, 1)
+        region = self.image[y0:y1, x0:x1]
+        region[inside] = to_bytes(shade[inside][:, None] * color)
+
+    def rgb(self): #(height, width, 3) uint8, reused for the next frame
+        return self.image
+
+
+def to_bytes(color): #Colors in 0..1 as uint8
+    return (np.clip(np.asarray(color, dtype=np.float32), 0, 1) * 255 + 0.5).astype(np.uint8)
+
+
+def _chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+def write_png(path, rgb, level=1): #8 bit RGB PNG; low compression levels keep export fast
+    height, width, _ = rgb.shape
+    rows = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 0] = 0 #Filter type: none
+    rows[:, 1:] = rgb.reshape(height, width * 3)
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(_chunk(b'IHDR', header))
+        f.write(_chunk(b'IDAT', zlib.compress(rows, level)))
+        f.write(_chunk(b'IEND', b''))
@@ -0,0 +1,288 @@
+import argparse
+import atexit
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+import numpy as np
+
+#Session recording: every frame (version_1) or simulation step (version_2) is appended as
+#one row of float32 columns (sun, planets, belt, UI state) plus its float64 time. Rows are
+#grouped into chunks; a chunk stores its first row and then second differences between
+#rows, taken on the float32 bits as integers (so nothing is lost; smooth motion leaves
+#small numbers), byte-shuffled and zlib compressed. The chunk index is written on close
+#and rebuilt from the chunk headers if a session ended without one. Replay memory-maps the
+#file and decodes one chunk to reach any row, so scrubbing costs the same anywhere.
+#
+#   python final/final_main.py --record session.rec
+#   python final/final_main.py --replay session.rec
+#   python final/recording.py session.rec
+
+MAGIC = b'SSREC001'
+HEADER = struct.Struct('<8sIII') #magic, metadata length, float32 values per row, rows per chunk
+CHUNK = struct.Struct('<II') #rows, compressed length
+TRAILER = struct.Struct('<QQ8s') #index offset, chunks, end marker
+END = b'SSRECEND'
+INDEX = np.dtype([('offset', '<u8'), ('rows', '<u4'), ('length', '<u4'), ('t_min', '<f8'), ('t_max', '<f8')])
+
+def _shuffle(a): #Byte planes (all first bytes, all second bytes, ...): the deltas' zero high bytes compress well
+    return a.view(np.uint8).reshape(-1, a.itemsize).T.tobytes()
+
+def _unshuffle(data, dtype, count, offset=0):
+    size = np.dtype(dtype).itemsize
+    planes = np.frombuffer(data, dtype=np.uint8, count=count * size, offset=offset).reshape(size, count)
+    return planes.T.copy().view(dtype).ravel()
+
+def _delta(bits): #First row kept, then second differences; integer overflow wraps like the cumsum that undoes it
+    deltas = bits.copy()
+    for _ in range(2):
+        deltas[1:] = np.diff(deltas, axis=0)
+    return deltas
+
+def _undelta(deltas):
+    return np.cumsum(np.cumsum(deltas, axis=0, dtype=deltas.dtype), axis=0, dtype=deltas.dtype)
+
+def encode_chunk(rows, times, level=6): #(n, width) float32 rows and n float64 times -> chunk bytes
+    payload = zlib.compress(_shuffle(_delta(rows.view('<i4'))) + _shuffle(_delta(times.view('<i8'))), level)
+    return CHUNK.pack(len(rows), len(payload)) + payload
+
+def decode_chunk(payload, rows, width): #Chunk payload (without header) -> (rows, width) float32, rows float64
+    data = zlib.decompress(payload)
+    values = _undelta(_unshuffle(data, '<i4', rows * width).reshape(rows, width))
+    times = _undelta(_unshuffle(data, '<i8', rows, offset=rows * width * 4))
+    return values.view('<f4'), times.view('<f8')
+
+
+class Recorder:
+    def __init__(self, path, columns, meta=None, chunk=None, level=6):
+        #columns: name -> shape of one value, e.g. {'positions': (8, 3), 'paused': ()}
+        #chunk: rows per chunk, by default about 256 KB of rows (a seek decodes one chunk)
+        self.path = path
+        self.layout = {}
+        width = 0
+        for name, shape in columns.items():
+            size = int(np.prod(shape))
+            self.layout[name] = (width, width + size)
+            width += size
+        self.width = width
+        self.chunk = chunk or min(256, max(16, 65536 // max(width, 1)))
+        self.level = level
+        self.rows = 0
+        self.meta = dict(meta or {}, columns=[[name, list(shape)] for name, shape in columns.items()])
+        self._buffer = np.zeros((self.chunk, width), dtype='<f4')
+        self._times = np.zeros(self.chunk)
+        self._count = 0 #Rows in the buffer
+        self._last = np.zeros(width, dtype='<f4') #Columns left out of add() keep their last value
+        self._index = []
+        meta_bytes = json.dumps(self.meta).encode()
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, len(meta_bytes), width, self.chunk))
+        self._file.write(meta_bytes)
+        atexit.register(self.close) #The render loops never return, the index is written at exit
+
+    def add(self, t, **values):
+        row = self._buffer[self._count]
+        row[:] = self._last
+        for name, value in values.items():
+            start, stop = self.layout[name]
+            row[start:stop] = np.ravel(value)
+        self._last[:] = row
+        self._times[self._count] = t
+        self._count += 1
+        self.rows += 1
+        if self._count == self.chunk:
+            self._write_chunk()
+
+    def add_state(self, state, **ui): #A simulation state dict plus UI values
+        values = {name: state[name] for name in ('sun', 'positions', 'belt') if name in self.layout}
+        self.add(state['time'], **values, **ui)
+
+    def _write_chunk(self):
+        n = self._count
+        if not n:
+            return
+        times = self._times[:n]
+        data = encode_chunk(self._buffer[:n], times, self.level)
+        self._index.append((self._file.tell(), n, len(data) - CHUNK.size, times.min(), times.max()))
+        self._file.write(data)
+        self._file.flush() #A crashed session keeps every finished chunk
+        self._count = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._write_chunk()
+        offset = self._file.tell()
+        self._file.write(np.array(self._index, dtype=INDEX).tobytes())
+        self._file.write(TRAILER.pack(offset, len(self._index), END))
+        self._file.close()
+        atexit.unregister(self.close)
+
+
+def recorder_for(path, state, meta=None, ui=(), chunk=None): #Recorder with columns for a simulation state and UI values
+    columns = {name: np.shape(state[name]) for name in ('sun', 'positions', 'belt') if state.get(name) is not None}
+    columns.update((name, ()) for name in ui)
+    return Recorder(path, columns, meta, chunk)
+
+
+class Replay: #Memory-mapped recording; row(k) decodes at most one chunk
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, meta_length, self.width, self.chunk = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"Not a recording: {path}")
+        self.meta = json.loads(self._map[HEADER.size:HEADER.size + meta_length])
+        self.columns = {name: tuple(shape) for name, shape in self.meta['columns']}
+        self.layout = {}
+        width = 0
+        for name, shape in self.columns.items():
+            size = int(np.prod(shape))
+            self.layout[name] = (width, width + size)
+            width += size
+        self._data_start = HEADER.size + meta_length
+        self.index = self._read_index()
+        self.starts = np.concatenate([[0], np.cumsum(self.index['rows'], dtype=np.int64)])
+        self._cached = None #(chunk, rows, times) of the last decoded chunk
+
+    def _read_index(self):
+        if len(self._map) >= self._data_start + TRAILER.size:
+            offset, chunks, end = TRAILER.unpack_from(self._map, len(self._map) - TRAILER.size)
+            if end == END:
+                return np.frombuffer(self._map, dtype=INDEX, count=chunks, offset=offset)
+        return self._scan()
+
+    def _scan(self): #No index (the session did not end cleanly): walk the chunk headers
+        entries = []
+        offset = self._data_start
+        while offset + CHUNK.size <= len(self._map):
+            rows, length = CHUNK.unpack_from(self._map, offset)
+            if offset + CHUNK.size + length > len(self._map):
+                break #Cut off while writing
+            entries.append((offset, rows, length, -np.inf, np.inf))
+            offset += CHUNK.size + length
+        return np.array(entries, dtype=INDEX)
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def _chunk(self, c):
+        if self._cached is None or self._cached[0] != c:
+            entry = self.index[c]
+            start = int(entry['offset']) + CHUNK.size
+            rows, times = decode_chunk(self._map[start:start + int(entry['length'])], int(entry['rows']), self.width)
+            self._cached = (c, rows, times)
+        return self._cached
+
+    def row(self, k): #(float32 row, time) of row k
+        c = int(np.searchsorted(self.starts, k, side='right')) - 1
+        _, rows, times = self._chunk(c)
+        return rows[k - self.starts[c]], float(times[k - self.starts[c]])
+
+    def frame(self, k): #Row k as a dict: time and every column in its recorded shape
+        row, t = self.row(k)
+        result = {'time': t}
+        for name, (start, stop) in self.layout.items():
+            value = row[start:stop].astype(np.float64)
+            result[name] = value.reshape(self.columns[name]) if self.columns[name] else float(value[0])
+        return result
+
+    def find(self, t): #First row at or after time t (the last row if there is none)
+        for c in np.flatnonzero(self.index['t_max'] >= t).tolist():
+            _, _, times = self._chunk(c)
+            later = np.flatnonzero(times >= t)
+            if len(later):
+                return int(self.starts[c] + later[0])
+        return len(self) - 1
+
+    def close(self):
+        self._cached = None
+        self.index = None
+        self._map.close()
+        self._file.close()
+
+
+class ReplaySimulation: #Simulation interface over a Replay; step() moves one recorded row forward
+    def __init__(self, replay, version=None):
+        if not len(replay):
+            raise ValueError('Empty recording')
+        if version is not None and replay.meta.get('version', version) != version:
+            raise ValueError(f"Recorded with version_{replay.meta['version']}, not version_{version}")
+        self.replay = replay
+        self.epoch = datetime.fromisoformat(replay.meta['epoch']) if 'epoch' in replay.meta else None
+        self.seek(0)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def seek(self, k):
+        self.frame = min(max(int(k), 0), len(self.replay) - 1)
+        self.values = self.replay.frame(self.frame)
+        self.time = self.values['time']
+        self.sun = self.values.get('sun', np.zeros(3))
+        self.positions = self.values['positions']
+        self.belt = self.values.get('belt')
+        if self.epoch is not None:
+            self.date = self.epoch + timedelta(days=self.time)
+        return self.state()
+
+    def step(self, dt=1): #The recording fixes the pace; dt is ignored
+        if self.frame + 1 < len(self.replay):
+            return self.seek(self.frame + 1)
+        return self.state()
+
+    def set_time(self, t):
+        return self.seek(self.replay.find(t))
+
+    def set_date(self, date):
+        return self.set_time((date - self.epoch).total_seconds() / 86400)
+
+    def ui(self, name, default=None): #Recorded UI value of the current row
+        return self.values.get(name, default)
+
+    def status_text(self):
+        return f'Replay {self.frame + 1}/{len(self.replay)}'
+
+    def state(self):
+        state = {'time': self.time, 'sun': self.sun, 'positions': self.positions}
+        if self.belt is not None:
+            state['belt'] = self.belt
+        if self.epoch is not None:
+            state['date'] = self.date
+        return state
+
+
+def main(argv=None): #Size of a recording and what replaying it costs
+    parser = argparse.ArgumentParser(description='Show the size of a session recording and time its replay')
+    parser.add_argument('path')
+    parser.add_argument('--seeks', type=int, default=200, help='random seeks to time')
+    args = parser.parse_args(argv)
+
+    replay = Replay(args.path)
+    size = os.path.getsize(args.path)
+    raw = len(replay) * (replay.width * 4 + 8)
+    print(f"{len(replay)} rows x {replay.width} values in {len(replay.index)} chunks, "
+          f"version {replay.meta.get('version', '?')}")
+    print(f"{size / 1024:.0f} KB ({size / max(len(replay), 1):.0f} bytes/row, {raw / max(size, 1):.1f}x smaller than float32)")
+
+    sim = ReplaySimulation(replay)
+    started = time.perf_counter()
+    for _ in range(len(replay) - 1):
+        sim.step()
+    elapsed = time.perf_counter() - started
+    print(f"Sequential replay: {elapsed / max(len(replay) - 1, 1) * 1e6:.1f} µs/row")
+    targets = np.random.default_rng(0).integers(0, len(replay), args.seeks).tolist()
+    started = time.perf_counter()
+    for k in targets:
+        sim.seek(k)
+    print(f"Random seek: {(time.perf_counter() - started) / args.seeks * 1000:.2f} ms")
+    replay.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import math
+import numpy as np
+from kepler import KeplerEngine
+
+#Hierarchical bodies: every node (moon, ring particle, spacecraft) orbits a parent, which is
+#the sun, a planet of the simulation or another node. Nodes are sorted by depth and every
+#depth is one KeplerEngine, so a frame costs one batched orbit pass per level plus one
+#gather of the parents' world positions, however many moons or particles a level holds.
+
+RINGS = ( #Parent, inner and outer radius (scene units), period at the inner edge in years and
+          #in frames / 100 (like 'orbital_period' and 'frame_period'), inclination and node in degrees
+    ('Saturn', 2.0, 3.4, 0.00066, 0.3, 26.7, 169.5),
+)
+
+def ring_nodes(parent, count, inner, outer, period, inclination=0.0, ascending_node=0.0, seed=0):
+    #count particles on circular orbits between inner and outer, evenly spread over the ring's
+    #area; period at the inner edge, longer outwards by Kepler's third law (angles in radians)
+    rng = np.random.default_rng(seed)
+    radius = np.sqrt(rng.uniform(inner ** 2, outer ** 2, count))
+    periods = period * (radius / inner) ** 1.5
+    angles = rng.uniform(0, 2 * math.pi, count)
+    return [{'name': f'{parent} ring', 'parent': parent, 'orbital_radius': r, 'orbital_period': p,
+             'angle_at_start': a, 'phi_offset': a, 'inclination': inclination, 'ascending_node': ascending_node}
+            for r, p, a in zip(radius.tolist(), periods.tolist(), angles.tolist())]
+
+def planet_rings(mode, count=3000, seed=0): #Ring particles of every planet in RINGS ('date' or 'frame' periods)
+    nodes = []
+    for parent, inner, outer, years, frames, inclination, node in RINGS:
+        nodes += ring_nodes(parent, count, inner, outer, years if mode == 'date' else frames,
+                            math.radians(inclination), math.radians(node), seed)
+    return nodes
+
+
+class SceneGraph:
+    def __init__(self, nodes, planet_names, period_scale, angle_key=None, offset_key=None,
+                 plane=((1, 0, 0), (0, 0, 1))):
+        #nodes: body dicts as from catalog.planets_data (with elements) plus 'parent'
+        #planet_names: bodies positioned by the simulation, in the order of its positions
+        #period_scale, angle_key, offset_key: as for the simulation's engine (OrbitEngine.from_planets)
+        #plane: (u, v) of the simulation's orbital plane; inclinations are relative to it
+        roots = ['Sun'] + list(planet_names)
+        names = roots + [data['name'] for data in nodes]
+        index = {}
+        for i, name in enumerate(names):
+            index.setdefault(name, i) #Ring particles share a name, they are nobody's parent
+        parents = []
+        for data in nodes:
+            if data.get('parent', 'Sun') not in index:
+                raise ValueError(f"Unknown parent {data['parent']!r} of {data['name']}")
+            parents.append(index[data.get('parent', 'Sun')])
+
+        depth = [0] * len(roots) + [None] * len(nodes)
+        for i in range(len(nodes)):
+            chain = [len(roots) + i]
+            while depth[chain[-1]] is None: #Walk up to a node of known depth
+                if len(chain) > len(names):
+                    raise ValueError(f"Cycle in the parents of {nodes[i]['name']}")
+                chain.append(parents[chain[-1] - len(roots)])
+            for j in reversed(chain[:-1]):
+                depth[j] = depth[parents[j - len(roots)]] + 1
+
+        order = np.argsort(depth[len(roots):], kind='stable') #Level by level, input order within a level
+        self.rows = np.empty(len(nodes), dtype=np.int64) #World row of every node
+        self.rows[order] = len(roots) + np.arange(len(nodes))
+        self.world = np.zeros((len(names), 3)) #Sun, planets, then the nodes level by level
+        self.roots = len(roots)
+
+        u, v = (np.asarray(axis, dtype=np.float64) for axis in plane)
+        basis = np.array([u, np.cross(v, u), v]) #Kepler's x/y/z (ecliptic x-z, y up) to the plane
+        self.levels = [] #(first row, last row + 1, parent rows, engine, scratch)
+        start = len(roots)
+        for level in sorted(set(depth[len(roots):])):
+            members = [i for i in order.tolist() if depth[len(roots) + i] == level]
+            engine = KeplerEngine.from_planets([nodes[i] for i in members], period_scale,
+                                               angle_key=angle_key, offset_key=offset_key)
+            engine.P = engine.P @ basis
+            engine.Q = engine.Q @ basis
+            parent_rows = np.array([parents[i] if parents[i] < len(roots) else self.rows[parents[i] - len(roots)]
+                                    for i in members], dtype=np.int64)
+            self.levels.append((start, start + len(members), parent_rows, engine, np.empty((len(members), 3))))
+            start += len(members)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def update(self, t, sun, positions): #World positions of every node at time t; returns self.world
+        self.world[0] = sun
+        self.world[1:self.roots] = positions
+        for start, stop, parent_rows, engine, scratch in self.levels:
+            np.take(self.world, parent_rows, axis=0, out=scratch)
+            np.add(scratch, engine.set_time(t), out=self.world[start:stop])
+        return self.world
+
+    def positions(self, nodes=slice(None)): #World positions (copy) of nodes by index, in node order
+        return self.world[self.rows[nodes]]
@@ -0,0 +1,247 @@
+import argparse
+import math
+import sys
+import time
+from collections import namedtuple
+import numpy as np
+import catalog
+from simulation import (DateSimulation, MovingSunSimulation, UpwardsSimulation, SpiralSimulation, CircleSimulation,
+                        TiltedSimulation, TrajectoryStream)
+from star_field import StarField, generate_star_shell
+from trails import CurveTrails
+from texture_cache import TextureLoader, average_color
+from lod import LODManager
+from clock import FixedStepClock
+from attribute_sync import AttributeSync
+
+#Persistent session: one canvas, sun, light, textured planets, star shell, orbit curves and
+#trails are built once and every mode (the date-based version 1, the moving sun of version 2
+#and the presentations) renders into them. Switching a mode only swaps the simulation (kept
+#per mode, so returning continues where it was), the clock and what is visible, and moves
+#the camera. Switch latency is measured up to the first frame of the new mode being flushed.
+#
+#   python final/final_main.py (button 'Alle Modi')
+#   python final/session.py [--cycles N] [--frames N]
+
+Mode = namedtuple('Mode', 'label data simulation speed follow stars orbits trails')
+#data: catalog mode ('date' or 'frame'); speed: steps per second (days in the date mode);
+#follow: the camera follows the sun; stars, orbits, trails: what the mode shows
+
+MODES = {
+    'date': Mode('Datum (Version 1)', 'date', lambda data: DateSimulation(data, catalog.DATE_EPOCH),
+                 50, False, False, True, False),
+    'moving': Mode('Bewegte Sonne (Version 2)', 'frame', lambda data: MovingSunSimulation(data),
+                   60, True, True, False, True),
+    'upwards': Mode('Präsentation: aufwärts', 'frame', lambda data: TrajectoryStream(UpwardsSimulation(data)),
+                    50, True, False, False, True),
+    'spiral': Mode('Präsentation: Spirale', 'frame', lambda data: TrajectoryStream(SpiralSimulation(data)),
+                   50, True, False, False, True),
+    'circle': Mode('Präsentation: Kreisbahn', 'frame', lambda data: TrajectoryStream(CircleSimulation(data)),
+                   50, True, False, False, True),
+    'tilted': Mode('Präsentation: geneigt', 'frame', lambda data: TrajectoryStream(TiltedSimulation(data)),
+                   50, True, False, False, True),
+}
+
+class Session:
+    def __init__(self, scene, catalog_path=catalog.DEFAULT_PATH, star_count=2000, trail_max_points=1000,
+                 trail_delay_time=2, timer=time.perf_counter):
+        from vpython import sphere, local_light, curve, vector #Imported here so the module loads headless
+        started = timer()
+        self.scene = scene
+        self.timer = timer
+        self.trail_delay_time = trail_delay_time #Seconds after a switch before trails start
+        bodies = catalog.load(catalog_path)
+        self.planets_data = {'date': bodies.planets_data('date'), 'frame': bodies.planets_data('frame')}
+        data = self.planets_data['date']
+
+        self.sun = sphere(pos=vector(0, 0, 0), radius=2, color=vector(1, 1, 0), emissive=True)
+        self.sun_light = local_light(pos=self.sun.pos, color=vector(1, 1, 1))
+        self.textures = TextureLoader() #Loaded once for every mode
+        self.planets = []
+        for body in data:
+            planet = sphere(pos=vector(body['orbital_radius'], 0, 0), radius=body['radius'], color=vector(1, 1, 1),
+                            make_trail=False, shininess=0)
+            if 'texture' in body: #Optional in a catalog: without one the catalog color, else white
+                self.textures.apply(planet, body['texture'])
+            elif 'color' in body:
+                planet.color = vector(*body['color'])
+            planet.name = body['name']
+            self.planets.append(planet)
+        self.sync = AttributeSync(min_pixels=0.5)
+        proxy_colors = [average_color(body['texture']) if 'texture' in body else body.get('color') for body in data]
+        self.lod = LODManager(self.planets, [body['radius'] for body in data],
+                              colors=[vector(*(c or (0.7, 0.7, 0.7))) for c in proxy_colors], sync=self.sync)
+
+        self.sims = {'date': MODES['date'].simulation(data)} #Simulation per mode, created on first use
+        self.orbits = [curve(pos=[vector(x, y, z) for x, y, z in self.sims['date'].engine.orbit_path(i).tolist()],
+                             radius=0.05, color=vector(0.3, 0.3, 0.3)) for i in range(len(data))]
+        offsets, colors = generate_star_shell(radius=1500, count=star_count)
+        self.stars = StarField(offsets, colors)
+        self.stars.visible = False
+        self.trails = CurveTrails(self.planets, max_points=trail_max_points)
+        self.home = (vector(0, 0, 0), vector(scene.forward), scene.range) #Fixed view of the date mode
+
+        self.speeds = {name: mode.speed for name, mode in MODES.items()} #Kept per mode across switches
+        self.paused = False
+        self.name = None
+        self.switch_times = [] #Milliseconds from switch() to the first flushed frame of the new mode
+        self._switch_started = None
+        self.setup_ms = (timer() - started) * 1000
+
+    def switch(self, name): #Show another mode in place
+        started = self.timer()
+        mode = MODES[name]
+        if name not in self.sims:
+            self.sims[name] = mode.simulation(self.planets_data[mode.data])
+        self.name = name
+        self.mode = mode
+        self.sim = self.sims[name]
+        self.clock = FixedStepClock(step=1, speed=self.speeds[name], target_fps=60, max_substeps=8)
+        self.previous_sun = self.sim.sun.copy()
+        self.previous_positions = self.sim.positions.copy()
+        self.render_sun = self.sim.sun.copy()
+        self.render_positions = self.sim.positions.copy()
+        self.steps = 0 #Since the switch, for the trail delay
+
+        self.stars.visible = mode.stars
+        for orbit in self.orbits:
+            orbit.visible = mode.orbits
+        self.trails.clear() #A trail of the previous mode would jump across the scene
+        self.trails.visible = mode.trails
+        if mode.follow:
+            self.scene.camera.follow(self.sun)
+        else:
+            self.scene.camera.follow(None)
+            center, forward, scene_range = self.home
+            self.scene.center, self.scene.forward, self.scene.range = center, forward, scene_range
+        self._show_sun(self.render_sun)
+        self._switch_started = started
+
+    def set_speed(self, speed):
+        self.speeds[self.name] = speed
+        self.clock.speed = speed
+
+    def _show_sun(self, sun):
+        xyz = sun.tolist()
+        self.sync.pos(self.sun, xyz)
+        self.sync.pos(self.sun_light, xyz)
+        if self.mode.stars:
+            self.sync.pos(self.stars.obj, xyz, self.stars.attribute) #Star shell around the sun (as stars.follow)
+
+    def frame(self, camera): #One rendered frame: fixed steps, interpolated positions, one flush
+        self.sync.begin(camera)
+        self.textures.upgrade()
+        sim, clock = self.sim, self.clock
+        steps = clock.tick(running=not self.paused)
+        for _ in range(steps):
+            self.previous_sun[:] = sim.sun
+            self.previous_positions[:] = sim.positions
+            state = sim.step(clock.step)
+            self.steps += 1
+            if self.mode.trails and self.steps >= self.trail_delay_time * max(1, clock.speed):
+                self.trails.push(state['positions'])
+        if self.paused: #The camera can still move: switch levels of detail where needed
+            self.lod.update(self.render_positions, camera, moved=False)
+        else:
+            clock.interpolate(self.previous_sun, sim.sun, out=self.render_sun)
+            clock.interpolate(self.previous_positions, sim.positions, out=self.render_positions)
+            self._show_sun(self.render_sun)
+            self.lod.update(self.render_positions, camera)
+        self.sync.flush()
+        if self._switch_started is not None:
+            self.switch_times.append((self.timer() - self._switch_started) * 1000)
+            self._switch_started = None
+        return steps
+
+    def date(self): #Shown date of the date mode, None in the others
+        return getattr(self.sim, 'date', None)
+
+    def status_text(self):
+        if not self.switch_times:
+            return ''
+        return (f'Moduswechsel: {self.switch_times[-1]:.1f} ms (Median {np.median(self.switch_times):.1f} ms), '
+                f'Aufbau: {self.setup_ms:.0f} ms')
+
+
+def run_session(screen_size=None, mode='date', catalog_path=catalog.DEFAULT_PATH):
+    #screen_size is accepted for symmetry with the versions; mode: first mode (a key of MODES)
+    from vpython import canvas, color, vector, rate, slider, menu, wtext
+    from picking import camera_from_scene
+    scene = canvas(title='3D Solar System (Sitzung)',
+                   width=1920*1.25, height=1080-50,
+                   center=vector(0, 0, 0),
+                   background=color.black,
+                   ambient=vector(0, 0, 0),
+                   autoscale=False)
+    scene.lights = []
+    session = Session(scene, catalog_path)
+    names = list(MODES)
+
+    def choose(name):
+        session.switch(name)
+        mode_menu.index = names.index(name)
+        speed_slider.value = session.speeds[name]
+        speed_text.text = 'Tage/s' if name == 'date' else 'Schritte/s'
+
+    def handle_keydown(evt):
+        if evt.key == ' ':
+            session.paused = not session.paused
+        elif len(evt.key) == 1 and evt.key in '123456' and int(evt.key) <= len(names):
+            choose(names[int(evt.key) - 1])
+
+    scene.bind('keydown', handle_keydown)
+    scene.append_to_caption('Modus: ')
+    mode_menu = menu(choices=[MODES[name].label for name in names], index=names.index(mode),
+                     bind=lambda m: choose(names[m.index]))
+    scene.append_to_caption('   Geschwindigkeit: ')
+    speed_slider = slider(min=1, max=500, value=MODES[mode].speed, length=300, bind=lambda s: session.set_speed(s.value))
+    speed_text = wtext(text='')
+    scene.append_to_caption('\n\n')
+    date_text = wtext(text='')
+    status_text = wtext(text='')
+    scene.append_to_caption('\n\n[Leertaste] Pause/Start, [1]-[6] Modus wechseln')
+    choose(mode)
+
+    frame = 0
+    while True:
+        rate(60)
+        switches = len(session.switch_times)
+        session.frame(camera_from_scene(scene))
+        date = session.date()
+        session.sync.text(date_text, f'Date: {date.strftime("%Y-%m-%d")}   ' if date is not None else '')
+        frame += 1
+        if len(session.switch_times) > switches or frame % 60 == 0: #Latency of a switch as soon as it is known
+            session.sync.text(status_text, session.status_text())
+        session.sync.flush()
+
+
+def main(argv=None): #Switch latency against the cost of building the scene, with a stub renderer
+    parser = argparse.ArgumentParser(description='Measure mode switches of a persistent session (headless)')
+    parser.add_argument('--cycles', type=int, default=5, help='passes through every mode')
+    parser.add_argument('--frames', type=int, default=30, help='frames rendered per visit')
+    args = parser.parse_args(argv)
+
+    from benchmark import install_stub_renderer, StubVector
+    stub = install_stub_renderer()
+    scene = stub.canvas(forward=StubVector(0, 0, -1), range=10, center=StubVector())
+    scene.camera = stub.canvas(follow=lambda obj: None)
+    camera = ((0, 0, 60), (0, 0, -1), (0, 1, 0), math.pi / 3, (1920, 1080))
+    session = Session(scene)
+    first = {}
+    for cycle in range(args.cycles):
+        for name in MODES:
+            session.switch(name)
+            for _ in range(args.frames):
+                session.frame(camera)
+            first.setdefault(name, session.switch_times[-1])
+    again = np.array(session.switch_times[len(MODES):])
+    print(f'Session setup: {session.setup_ms:.1f} ms')
+    for name, ms in first.items():
+        print(f'  first switch to {name:8s} {ms:7.2f} ms')
+    if len(again):
+        print(f'Later switches: median {np.median(again):.2f} ms, max {again.max():.2f} ms ({len(again)} switches)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
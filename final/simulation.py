@@ -0,0 +1,330 @@
+import math
+from datetime import timedelta
+import numpy as np
+from orbit_engine import OrbitEngine
+from kepler import KeplerEngine
+
+#Headless simulation core: no vpython, no rate(), no canvas. Every mode exposes
+#step(dt), state() and positions_at(t); the visual versions only render its output.
+#positions are absolute (sun position included), arrays in state() are reused per step.
+
+class Simulation:
+    def __init__(self, engine):
+        self.engine = engine
+        self.time = 0.0 #Simulated time in the mode's time unit
+        self.sun = np.zeros(3) #Current sun position
+        self.positions = np.zeros((len(engine), 3)) #Current absolute planet positions
+        self._update()
+
+    def __len__(self):
+        return len(self.engine)
+
+    def sun_position(self, t): #Sun position at time t (fixed at the origin by default)
+        return np.zeros(3)
+
+    def relative_positions_at(self, t): #Planet positions relative to the sun at time t
+        return self.engine.positions_at(t)
+
+    def _update(self): #Evaluate the current time in closed form
+        self.sun[:] = self.sun_position(self.time)
+        np.add(self.engine.set_time(self.time), self.sun, out=self.positions)
+
+    def step(self, dt=1):
+        self.time += dt
+        self._update()
+        return self.state()
+
+    def set_time(self, t):
+        self.time = t
+        self._update()
+        return self.state()
+
+    def state(self):
+        return {'time': self.time, 'sun': self.sun, 'positions': self.positions}
+
+    def positions_at(self, t): #Absolute positions at time t without changing the state
+        return self.relative_positions_at(t) + self.sun_position(t)
+
+    def sun_positions(self, times): #Sun positions (T, 3) at many times
+        return np.array([self.sun_position(t) for t in times]).reshape(len(times), 3)
+
+    def relative_positions_batch(self, times): #Planet positions relative to the sun (T, n, 3) at many times
+        return self.engine.positions_batch(times)
+
+    def trajectory(self, times): #Sun (T, 3) and absolute planet positions (T, n, 3) at many times in one pass
+        times = np.asarray(times, dtype=np.float64)
+        sun = self.sun_positions(times)
+        return sun, self.relative_positions_batch(times) + sun[:, None, :]
+
+
+class DateSimulation(Simulation): #version_1: sun at the origin, time in days since the epoch
+    def __init__(self, planets_data, epoch):
+        self.epoch = epoch #Date at which every planet is at its 'angle_at_start' (mean longitude)
+        self.date = epoch
+        #Keplerian orbits from the optional elements 'eccentricity', 'inclination',
+        #'ascending_node' and 'perihelion' (circular when they are missing)
+        engine = KeplerEngine.from_planets(planets_data, period_scale=365.25, angle_key='angle_at_start')
+        super().__init__(engine)
+
+    def days_since_epoch(self, date):
+        return (date - self.epoch).total_seconds() / 86400
+
+    def step(self, dt=1): #Advance by dt days; the date itself is exact, no float accumulation
+        return self.set_date(self.date + timedelta(days=dt))
+
+    def set_time(self, t):
+        return self.set_date(self.epoch + timedelta(days=t))
+
+    def set_date(self, date): #Jump to any date in O(1)
+        self.date = date
+        self.time = self.days_since_epoch(date)
+        self._update()
+        return self.state()
+
+    def state(self):
+        state = super().state()
+        state['date'] = self.date
+        return state
+
+
+class FrameSimulation(Simulation): #Visual modes: time in frames, angles scaled by period * 100
+    plane = ((1, 0, 0), (0, 0, 1)) #Orbital plane axes (cos, sin) relative to the sun
+
+    def __init__(self, planets_data):
+        axis_u, axis_v = self.plane
+        engine = OrbitEngine.from_planets(planets_data, period_scale=100, offset_key='phi_offset',
+                                          axis_u=axis_u, axis_v=axis_v)
+        super().__init__(engine)
+
+
+class MovingSunSimulation(FrameSimulation): #version_2: sun moves along x, orbital plane tilted
+    def __init__(self, planets_data, horizontal_speed=0.5, orbit_angle=math.radians(60.2)):
+        self.horizontal_speed = horizontal_speed
+        self.plane = ((0, 0, 1), (math.cos(orbit_angle), math.sin(orbit_angle), 0))
+        super().__init__(planets_data)
+
+    def sun_position(self, t):
+        return np.array([self.horizontal_speed * t, 0.0, 0.0])
+
+    def sun_positions(self, times):
+        sun = np.zeros((len(times), 3))
+        sun[:, 0] = self.horizontal_speed * np.asarray(times)
+        return sun
+
+
+class UpwardsSimulation(FrameSimulation): #presentation_basic_upwards_v1: sun moves straight up
+    def __init__(self, planets_data, vertical_speed=0.05):
+        self.vertical_speed = vertical_speed
+        super().__init__(planets_data)
+
+    def sun_position(self, t):
+        return np.array([0.0, self.vertical_speed * t, 0.0])
+
+    def sun_positions(self, times):
+        sun = np.zeros((len(times), 3))
+        sun[:, 1] = self.vertical_speed * np.asarray(times)
+        return sun
+
+
+class SpiralSimulation(FrameSimulation): #presentation_patern: upwards on a widening spiral
+    def __init__(self, planets_data, vertical_speed=0.05, twist_speed=0.02):
+        self.vertical_speed = vertical_speed
+        self.twist_speed = twist_speed
+        super().__init__(planets_data)
+
+    def sun_position(self, t):
+        k = t - 1 #The scripts use the frame index before it is incremented
+        return np.array([math.cos(self.twist_speed * k) * k * 0.1,
+                         self.vertical_speed * t,
+                         math.sin(self.twist_speed * k) * k * 0.1])
+
+    def sun_positions(self, times):
+        t = np.asarray(times, dtype=np.float64)
+        k = t - 1
+        return np.column_stack([np.cos(self.twist_speed * k) * k * 0.1,
+                                self.vertical_speed * t,
+                                np.sin(self.twist_speed * k) * k * 0.1])
+
+
+class CircleSimulation(FrameSimulation): #presentation_basic_moving_v1: upwards on a large circle
+    def __init__(self, planets_data, vertical_speed=0.05, sun_orbital_radius=5000, sun_orbital_speed=0.001):
+        self.vertical_speed = vertical_speed
+        self.sun_orbital_radius = sun_orbital_radius
+        self.sun_orbital_speed = sun_orbital_speed
+        super().__init__(planets_data)
+
+    def sun_position(self, t):
+        k = t - 1
+        return np.array([self.sun_orbital_radius * math.cos(self.sun_orbital_speed * k),
+                         self.vertical_speed * t,
+                         self.sun_orbital_radius * math.sin(self.sun_orbital_speed * k)])
+
+    def sun_positions(self, times):
+        t = np.asarray(times, dtype=np.float64)
+        k = t - 1
+        return np.column_stack([self.sun_orbital_radius * np.cos(self.sun_orbital_speed * k),
+                                self.vertical_speed * t,
+                                self.sun_orbital_radius * np.sin(self.sun_orbital_speed * k)])
+
+
+def rotate_vectors(v, axis, angle): #Rodrigues rotation of many vectors (n, 3) around one axis
+    c = math.cos(angle)
+    s = math.sin(angle)
+    return v * c + np.cross(axis, v) * s + np.multiply.outer(v @ axis, axis) * (1 - c)
+
+def rotation_matrices(axes, angle): #Rodrigues matrices (T, 3, 3) for many unit axes and one angle
+    c = math.cos(angle)
+    s = math.sin(angle)
+    x, y, z = axes[:, 0], axes[:, 1], axes[:, 2]
+    zero = np.zeros_like(x)
+    cross = np.stack([np.stack([zero, -z, y], axis=-1),
+                      np.stack([z, zero, -x], axis=-1),
+                      np.stack([-y, x, zero], axis=-1)], axis=-2) #cross(axis, v) as a matrix
+    return c * np.eye(3) + s * cross + (1 - c) * axes[:, :, None] * axes[:, None, :]
+
+
+class TiltedSimulation(FrameSimulation): #presentation_basic_moving_tilted: tilted plane following the sun
+    plane = ((0, 1, 0), (0, 0, 1)) #Un-tilted orbits lie in the y-z plane
+
+    def __init__(self, planets_data, forward_speed=0.1, sun_orbital_radius_y=5000,
+                 sun_orbital_speed=0.001, tilt=math.radians(60)):
+        self.forward_speed = forward_speed
+        self.sun_orbital_radius_y = sun_orbital_radius_y
+        self.sun_orbital_speed = sun_orbital_speed
+        self.tilt = tilt
+        #The sun path is a recurrence (its rotation axis comes from the previous frame's
+        #direction of motion), so frames are cached as they are first needed
+        self._sun_path = np.zeros((0, 3))
+        self._axes = np.zeros((0, 3))
+        super().__init__(planets_data)
+
+    def _extend_path(self, frames): #Compute sun positions and rotation axes up to the given frame count
+        n = len(self._sun_path)
+        if frames <= n:
+            return
+        sun_path = np.zeros((frames, 3))
+        axes = np.zeros((frames, 3))
+        sun_path[:n] = self._sun_path
+        axes[:n] = self._axes
+        #Scalar math in the same operation order as the vpython vectors of the original
+        #script: the recurrence amplifies rounding differences, so this keeps the path identical
+        px, py, pz = sun_path[n - 1] if n else (0.0, 0.0, 0.0)
+        kx, ky, kz = axes[n - 1] if n else (0.0, 0.0, 1.0)
+        c = math.cos(self.tilt)
+        s = math.sin(self.tilt)
+        for k in range(n, frames):
+            a = self.sun_orbital_speed * k
+            vy = self.sun_orbital_radius_y * math.cos(a)
+            vz = self.sun_orbital_radius_y * math.sin(a)
+            d = ky * vy + kz * vz #dot(axis, v) with v.x = 0
+            sx = self.forward_speed * k + (0.0 * c + (ky * vz - kz * vy) * s + kx * d * (1 - c))
+            sy = vy * c + (kz * 0.0 - kx * vz) * s + ky * d * (1 - c)
+            sz = vz * c + (kx * vy - ky * 0.0) * s + kz * d * (1 - c)
+            dx, dy, dz = sx - px, sy - py, sz - pz
+            length = math.sqrt(dx ** 2 + dy ** 2 + dz ** 2)
+            if length < 1e-6:
+                dx, dy, dz = 1.0, 0.0, 0.0
+            else:
+                dx, dy, dz = dx / length, dy / length, dz / length
+            kx, ky, kz = dz, 0.0, -dx #cross((0, 1, 0), direction)
+            length = math.sqrt(kx ** 2 + ky ** 2 + kz ** 2)
+            if length < 1e-6:
+                kx, ky, kz = 0.0, 0.0, 1.0
+            else:
+                kx, ky, kz = kx / length, ky / length, kz / length
+            sun_path[k] = (sx, sy, sz)
+            axes[k] = (kx, ky, kz)
+            px, py, pz = sx, sy, sz
+        self._sun_path = sun_path
+        self._axes = axes
+
+    def _frame(self, t): #Time t (frames stepped) maps to the script's frame index t - 1
+        k = max(int(math.floor(t)) - 1, 0)
+        self._extend_path(k + 2)
+        return k
+
+    def sun_position(self, t):
+        k = self._frame(t)
+        if t < 1:
+            return self._sun_path[0].copy()
+        f = t - 1 - k #Interpolate between frames for fractional time
+        return self._sun_path[k] * (1 - f) + self._sun_path[k + 1] * f
+
+    def relative_positions_at(self, t):
+        k = self._frame(t) #Extends the cached path first, so _axes covers frame k
+        return rotate_vectors(self.engine.positions_at(t), self._axes[k], self.tilt)
+
+    def _frames(self, times): #_frame for many times
+        k = np.maximum(np.floor(times).astype(np.int64) - 1, 0)
+        self._extend_path(int(k.max()) + 2 if len(k) else 0)
+        return k
+
+    def sun_positions(self, times):
+        times = np.asarray(times, dtype=np.float64)
+        k = self._frames(times)
+        f = np.where(times < 1, 0.0, times - 1 - k)[:, None]
+        return self._sun_path[k] * (1 - f) + self._sun_path[k + 1] * f
+
+    def relative_positions_batch(self, times): #One rotation matrix per time, applied to all planets at once
+        times = np.asarray(times, dtype=np.float64)
+        rotations = rotation_matrices(self._axes[self._frames(times)], self.tilt)
+        return np.einsum('tij,tnj->tni', rotations, self.engine.positions_batch(times))
+
+    def _update(self):
+        self.sun[:] = self.sun_position(self.time)
+        self.engine.set_time(self.time)
+        np.add(rotate_vectors(self.engine.positions, self._axes[self._frame(self.time)], self.tilt),
+               self.sun, out=self.positions)
+
+
+class TrajectoryStream: #A simulation's trajectory computed a chunk at a time; step() is an array index
+    #Same interface as the simulations. The sun path and all planets of a chunk are evaluated
+    #in one batched pass (simulation.trajectory), the next chunk when the current one runs out.
+    def __init__(self, sim, chunk=600, dt=1):
+        self.sim = sim
+        self.chunk = chunk #Steps per precomputed chunk
+        self.dt = dt #Time per step; step(dt) takes whole multiples of it
+        self.set_time(sim.time)
+
+    def __len__(self):
+        return len(self.sim)
+
+    def _load(self, t): #Precompute the chunk starting at time t
+        self._start = t
+        self._suns, self._positions = self.sim.trajectory(t + self.dt * np.arange(self.chunk))
+        self._index = 0
+
+    def _show(self):
+        self.time = self._start + self._index * self.dt
+        self.sun = self._suns[self._index]
+        self.positions = self._positions[self._index]
+        return self.state()
+
+    def step(self, dt=1):
+        steps = round(dt / self.dt)
+        if steps < 0 or abs(steps * self.dt - dt) > 1e-9 * abs(self.dt):
+            raise ValueError(f'TrajectoryStream steps forward in multiples of {self.dt}, not {dt}')
+        self._index += steps
+        if self._index >= self.chunk:
+            self._load(self._start + self._index * self.dt)
+        return self._show()
+
+    def set_time(self, t):
+        self._load(t)
+        return self._show()
+
+    def state(self):
+        return {'time': self.time, 'sun': self.sun, 'positions': self.positions}
+
+    def positions_at(self, t):
+        return self.sim.positions_at(t)
+
+
+MODES = { #Mode name -> simulation class
+    'date': DateSimulation,
+    'moving': MovingSunSimulation,
+    'upwards': UpwardsSimulation,
+    'spiral': SpiralSimulation,
+    'circle': CircleSimulation,
+    'tilted': TiltedSimulation,
+}
@@ -0,0 +1,154 @@
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+import numpy as np
+
+#Star field: the whole shell is one object (a compound mesh of tiny emissive triangles, or
+#one points object for large shells), so following the sun is a single update per frame.
+#Stars are procedural (seeded, uniform on the sphere) or read from a bright-star
+#catalog; a catalog is converted once to a binary table sorted by magnitude, so
+#culling to a magnitude limit is a binary search on a memory-mapped file.
+#
+#   python final/star_field.py hyg.csv --max-magnitude 6.5
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', '.cache')
+OBLIQUITY = math.radians(23.4393) #Tilt of the equator against the ecliptic (J2000)
+STARS = np.dtype([('direction', '<f4', 3), ('mag', '<f4'), ('color', '<f4', 3)]) #Cached table, brightest first
+BV_COLORS = ( #B-V color index -> rgb, from blue-white to red (interpolated in between)
+    (-0.4, (0.61, 0.69, 1.0)), (0.0, (0.79, 0.84, 1.0)), (0.4, (1.0, 0.98, 0.96)),
+    (0.8, (1.0, 0.91, 0.77)), (1.2, (1.0, 0.82, 0.61)), (2.0, (1.0, 0.67, 0.42)),
+)
+
+def generate_star_shell(radius, count, seed=0): #Offsets (count, 3) uniform on a sphere of radius and colors (count, 3)
+    rng = np.random.default_rng(seed)
+    directions = rng.normal(size=(count, 3)) #Normal in every axis: the direction is uniform on the sphere
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    return directions * radius, rng.uniform(0.7, 1, size=(count, 3))
+
+def bv_color(bv): #(n,) B-V color index -> (n, 3) rgb; nan (unknown) is white
+    stops = np.array([stop for stop, _ in BV_COLORS])
+    rgb = np.array([color for _, color in BV_COLORS])
+    bv = np.nan_to_num(np.asarray(bv, dtype=np.float64), nan=0.4)
+    return np.stack([np.interp(bv, stops, rgb[:, c]) for c in range(3)], axis=-1)
+
+def equatorial_to_scene(ra, dec): #Right ascension and declination (radians) -> (n, 3) unit vectors in the scene
+    x, y, z = np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)
+    cos_e, sin_e = math.cos(OBLIQUITY), math.sin(OBLIQUITY)
+    #Ecliptic coordinates, then ecliptic x-z plane with y up (scene y = ecliptic z, as in kepler.py)
+    return np.stack([x, -sin_e * y + cos_e * z, cos_e * y + sin_e * z], axis=-1)
+
+def _read_catalog(path): #Bright-star CSV -> STARS table sorted by magnitude
+    #Columns ra (hours), dec (degrees), mag and optionally ci (B-V), as in the HYG database
+    #and the Yale Bright Star Catalogue; rows without a position or magnitude are skipped
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader)]
+        wanted = [header.index(name) if name in header else None for name in ('ra', 'dec', 'mag', 'ci')]
+        if None in wanted[:3]:
+            raise ValueError(f'Star catalog needs the columns ra, dec and mag: {path}')
+        columns = [[] for _ in wanted]
+        for row in reader:
+            for column, i in zip(columns, wanted):
+                value = row[i].strip() if i is not None and i < len(row) else ''
+                column.append(float(value) if value else math.nan)
+    ra, dec, mag, ci = (np.array(column, dtype=np.float64) for column in columns)
+    keep = ~(np.isnan(ra) | np.isnan(dec) | np.isnan(mag)) & (mag > -5) #The sun is in some catalogs
+    order = np.argsort(mag[keep], kind='stable')
+    table = np.empty(len(order), dtype=STARS)
+    table['direction'] = equatorial_to_scene(np.radians(ra[keep] * 15), np.radians(dec[keep]))[order]
+    table['mag'] = mag[keep][order]
+    table['color'] = bv_color(ci[keep])[order]
+    return table
+
+def load_star_catalog(path, max_magnitude=6.5, cache_dir=CACHE_DIR): #Stars up to max_magnitude, brightest first
+    #Converted once and cached by file size and modification time; later loads memory-map the
+    #cache and cut it at the magnitude limit, so they cost the same for any catalog size
+    stat = os.stat(path)
+    cached = os.path.join(cache_dir, f'{os.path.basename(path)}_{stat.st_size}_{stat.st_mtime_ns}.npy')
+    if not os.path.isfile(cached):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cached + '.tmp.npy'
+        np.save(tmp, _read_catalog(path))
+        os.replace(tmp, cached) #Atomic, so a half-written file is never picked up
+    table = np.load(cached, mmap_mode='r')
+    return table[:np.searchsorted(table['mag'], max_magnitude, side='right')]
+
+def catalog_star_shell(table, radius, dimmest=0.35): #Offsets and colors from catalog stars; fainter stars are darker
+    mag = table['mag'].astype(np.float64)
+    brightness = np.clip(10 ** (-0.2 * (mag - mag.min(initial=0))), dimmest, 1) #Square root of the flux ratio
+    return table['direction'] * np.float32(radius), table['color'] * brightness[:, None]
+
+def triangle_corners(offsets, size): #(n, 3) offsets -> (n, 3, 3) corners and (n, 3) normals of triangles facing the center
+    offsets = np.asarray(offsets, dtype=np.float64)
+    normals = -offsets / np.linalg.norm(offsets, axis=1)[:, None]
+    helpers = np.where((np.abs(normals[:, 1]) < 0.9)[:, None], [0, 1, 0], [1, 0, 0])
+    a = np.cross(normals, helpers)
+    a *= size / np.linalg.norm(a, axis=1)[:, None]
+    b = np.cross(normals, a)
+    corners = np.stack([offsets + a, offsets - 0.5 * a + 0.866 * b, offsets - 0.5 * a - 0.866 * b], axis=1)
+    return corners, normals
+
+class StarField:
+    #Up to mesh_limit stars: one compound of tiny triangles (they scale with the view like the
+    #planets). Larger shells are one points object (fixed size in pixels), built in a single
+    #append, because a compound needs one vertex object per corner and that stops being
+    #interactive at a few thousand stars (100k: about 0.4 s as points, 3.4 s as a mesh,
+    #headless). Either way, following the sun is one attribute.
+    def __init__(self, offsets, colors, star_size=1.5, center=None, mesh_limit=5000, point_radius=1):
+        from vpython import vector #Imported here so the generators run headless
+        center = center if center is not None else vector(0, 0, 0)
+        offsets = np.asarray(offsets, dtype=np.float64)
+        colors = np.asarray(colors, dtype=np.float64)
+        self.count = len(offsets)
+        if self.count <= mesh_limit:
+            from vpython import vertex, triangle, compound
+            corners, normals = triangle_corners(offsets, star_size)
+            triangles = [triangle(vs=[vertex(pos=vector(*p), normal=vector(*n), color=vector(*c), emissive=True, shininess=0)
+                                      for p in star])
+                         for star, n, c in zip(corners.tolist(), normals.tolist(), colors.tolist())]
+            #origin at the shell center, so pos is exactly the point the stars surround
+            self.obj = compound(triangles, origin=vector(0, 0, 0), pos=center)
+            self.attribute = 'pos' #What moves the whole shell (e.g. for AttributeSync.pos)
+        else:
+            from vpython import points
+            self.obj = points(radius=point_radius, emissive=True, origin=center) #Points are relative to origin
+            self.obj.append([{'pos': vector(*p), 'color': vector(*c)} for p, c in zip(offsets.tolist(), colors.tolist())])
+            self.attribute = 'origin'
+
+    def follow(self, pos): #Move the whole shell, O(1) in star count
+        setattr(self.obj, self.attribute, pos)
+
+    @property
+    def visible(self):
+        return self.obj.visible
+
+    @visible.setter
+    def visible(self, value):
+        self.obj.visible = value
+
+
+def main(argv=None): #Convert a star catalog and time procedural and cached loads
+    parser = argparse.ArgumentParser(description='Build the star cache of a bright-star catalog and time star generation')
+    parser.add_argument('catalog', nargs='?', help='CSV with ra (hours), dec (degrees), mag and optionally ci')
+    parser.add_argument('--max-magnitude', type=float, default=6.5)
+    parser.add_argument('--count', type=int, default=100000, help='procedural stars to time')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    offsets, _ = generate_star_shell(1500, args.count)
+    print(f'{len(offsets)} procedural stars in {(time.perf_counter() - start) * 1000:.1f} ms')
+    if args.catalog:
+        for label in ('first load', 'cached load'):
+            start = time.perf_counter()
+            table = load_star_catalog(args.catalog, args.max_magnitude)
+            offsets, _ = catalog_star_shell(table, 1500)
+            print(f'{label}: {len(offsets)} stars up to magnitude {args.max_magnitude} '
+                  f'in {(time.perf_counter() - start) * 1000:.1f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
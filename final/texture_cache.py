@@ -0,0 +1,102 @@
+import hashlib
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+try: #Pillow is optional: without it the original files are used as they are
+    from PIL import Image
+except ImportError:
+    Image = None
+
+#Texture pipeline: textures are resolved relative to this module (not the working
+#directory), downscaled once to size-capped variants and cached by content hash.
+#A tiny placeholder is shown first and the full texture is swapped in lazily.
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEXTURE_DIR = os.path.join(MODULE_DIR, 'textures')
+CACHE_DIR = os.path.join(TEXTURE_DIR, '.cache')
+
+def resolve_texture(path): #Find a texture file whatever the current working directory is
+    candidates = [path,
+                  os.path.join(os.path.dirname(MODULE_DIR), path), #Paths like 'final/textures/earth.jpg'
+                  os.path.join(MODULE_DIR, path),
+                  os.path.join(TEXTURE_DIR, os.path.basename(path))]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return os.path.abspath(candidate)
+    raise FileNotFoundError(f"Texture not found: {path}")
+
+def content_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:16]
+
+def prepare_variant(path, max_size, cache_dir=CACHE_DIR): #Downscaled copy (longest side <= max_size), cached by hash
+    if Image is None:
+        return path
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = os.path.join(cache_dir, f'{content_hash(path)}_{max_size}.jpg')
+    if not os.path.isfile(cached):
+        with Image.open(path) as image:
+            image = image.convert('RGB')
+            image.thumbnail((max_size, max_size))
+            tmp = cached + '.tmp'
+            image.save(tmp, 'JPEG', quality=90)
+            os.replace(tmp, cached) #Atomic, so a half-written file is never picked up
+    return cached
+
+def average_color(texture): #Mean color of a texture as (r, g, b) in 0..1, None if unknown
+    if Image is None:
+        return None
+    try:
+        with Image.open(prepare_variant(resolve_texture(texture), 64)) as image:
+            r, g, b = image.convert('RGB').resize((1, 1), Image.BOX).getpixel((0, 0))
+    except (OSError, ValueError):
+        return None
+    return (r / 255, g / 255, b / 255)
+
+def texture_url(path): #vpython serves files relative to the working directory
+    url = os.path.relpath(path, os.getcwd())
+    if url.startswith('..'): #Not reachable from the working directory: copy it next to it
+        served_dir = os.path.join(os.getcwd(), '.texture_cache')
+        os.makedirs(served_dir, exist_ok=True)
+        target = os.path.join(served_dir, os.path.basename(path))
+        if not os.path.isfile(target):
+            shutil.copyfile(path, target)
+        url = os.path.relpath(target, os.getcwd())
+    return url.replace(os.sep, '/')
+
+
+class TextureLoader: #Placeholders first, full textures swapped in by upgrade() once prepared
+    def __init__(self, max_size=1024, placeholder_size=64, workers=2):
+        self.max_size = max_size #Cap for the full texture (longest side in pixels)
+        self.placeholder_size = placeholder_size
+        self.pending = [] #(object, future of the full texture path)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def apply(self, obj, texture): #Give obj a texture; returns False if the file is missing or unusable
+        try:
+            path = resolve_texture(texture)
+            placeholder = prepare_variant(path, self.placeholder_size)
+        except (OSError, ValueError) as e:
+            print(f"Error loading texture {texture}: {e}")
+            return False
+        obj.texture = texture_url(placeholder)
+        if placeholder != path:
+            self.pending.append((obj, self._executor.submit(prepare_variant, path, self.max_size)))
+        return True
+
+    def upgrade(self, limit=1): #Call once per frame: swap in at most limit finished full textures
+        swapped = 0
+        for item in list(self.pending):
+            obj, future = item
+            if swapped >= limit:
+                break
+            if not future.done():
+                continue
+            self.pending.remove(item)
+            try:
+                obj.texture = texture_url(future.result())
+            except (OSError, ValueError) as e:
+                print(f"Error loading texture: {e}") #Keep the placeholder
+            swapped += 1
+        return swapped
@@ -0,0 +1,88 @@
+import math
+import numpy as np
+
+#Bounded orbit trails: every body's trail lives in a fixed-size ring buffer, and a new
+#point that continues the last segment in (almost) the same direction replaces the last
+#point instead of being appended. Memory stays constant however long the session runs.
+
+class TrailSet: #Trails of many bodies in one (bodies, max_points, 3) array, no vpython needed
+    def __init__(self, bodies, max_points=1000, min_angle=math.radians(1.0), max_segment=None):
+        self.max_points = max_points
+        self.cos_min_angle = math.cos(min_angle) #Segments turning less than this are merged
+        self.max_segment = max_segment #Optional cap on the length of a merged segment
+        self.buffer = np.zeros((bodies, max_points, 3))
+        self.head = np.zeros(bodies, dtype=np.int64) #Index of the next write per body
+        self.count = np.zeros(bodies, dtype=np.int64) #Stored points per body
+        self._rows = np.arange(bodies)
+
+    def __len__(self):
+        return len(self.head)
+
+    def push(self, positions): #Add one position per body; returns (appended, dropped) masks
+        positions = np.asarray(positions, dtype=np.float64)
+        last_index = (self.head - 1) % self.max_points
+        prev_index = (self.head - 2) % self.max_points
+        last = self.buffer[self._rows, last_index]
+        prev = self.buffer[self._rows, prev_index]
+
+        d1 = last - prev
+        d2 = positions - last
+        n1 = np.linalg.norm(d1, axis=1)
+        n2 = np.linalg.norm(d2, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cos_turn = np.einsum('ij,ij->i', d1, d2) / (n1 * n2)
+        #Collinear (or not moving): extend the last segment by moving its end point
+        merge = (self.count >= 2) & ((n2 == 0) | (cos_turn >= self.cos_min_angle))
+        if self.max_segment is not None:
+            merge &= np.linalg.norm(positions - prev, axis=1) <= self.max_segment
+
+        appended = ~merge
+        dropped = appended & (self.count == self.max_points) #Ring buffer full: oldest point is overwritten
+        write_index = np.where(merge, last_index, self.head)
+        self.buffer[self._rows, write_index] = positions
+        self.head[appended] = (self.head[appended] + 1) % self.max_points
+        self.count[appended] = np.minimum(self.count[appended] + 1, self.max_points)
+        return appended, dropped
+
+    def points(self, i): #Trail of body i, oldest point first
+        n = self.count[i]
+        start = (self.head[i] - n) % self.max_points
+        return np.take(self.buffer[i], np.arange(start, start + n), axis=0, mode='wrap')
+
+    def clear(self):
+        self.head[:] = 0
+        self.count[:] = 0
+
+
+class CurveTrails(TrailSet): #TrailSet drawn with one vpython curve per body
+    def __init__(self, objects, max_points=1000, min_angle=math.radians(1.0), max_segment=None, radius=0):
+        from vpython import curve, vector #Imported here so TrailSet itself runs headless
+        super().__init__(len(objects), max_points, min_angle, max_segment)
+        self._vector = vector
+        self.curves = [curve(color=obj.color, radius=radius) for obj in objects]
+
+    def push(self, positions):
+        vector = self._vector
+        appended, dropped = super().push(positions)
+        for c, p, add, drop in zip(self.curves, positions.tolist(), appended.tolist(), dropped.tolist()):
+            if drop:
+                c.shift() #Keeps the Python side of the curve bounded as well
+            if add:
+                c.append(vector(*p))
+            else:
+                c.modify(c.npoints - 1, vector(*p)) #Move the end of the merged segment
+        return appended, dropped
+
+    def clear(self):
+        super().clear()
+        for c in self.curves:
+            c.clear()
+
+    @property
+    def visible(self):
+        return self.curves[0].visible if self.curves else True
+
+    @visible.setter
+    def visible(self, value):
+        for c in self.curves:
+            c.visible = value
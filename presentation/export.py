@@ -0,0 +1,179 @@
+import argparse
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+# Offline export of the presentation modes: frames are rendered headless with a small
+# software rasterizer (no browser, no vpython) and split across processes by frame range.
+# Every frame advances the simulation by exactly speed / fps steps, so the result has
+# the intended pacing however long a frame takes to render.
+#
+#   python presentation/export.py tilted --seconds 20 --out tilted.mp4
+#   python presentation/export.py patern --out frames/patern --size 2560x1440
+
+# The headless simulation core is shared with the final versions
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'final'))
+import catalog
+from simulation import SpiralSimulation, UpwardsSimulation, CircleSimulation, TiltedSimulation
+from trails import TrailSet
+from picking import project, camera_basis
+from star_field import generate_star_shell
+from raster import Rasterizer, write_png
+
+# Same planets as the presentation scripts (colors as plain tuples)
+planets_data = catalog.load().planets_data('frame')
+
+# Mode -> (simulation class, its parameters, seconds before trails start), as in each script
+MODES = {
+    'patern': (SpiralSimulation, {'vertical_speed': 0.05, 'twist_speed': 0.02}, None),
+    'upwards': (UpwardsSimulation, {'vertical_speed': 0.05}, 2),
+    'moving': (CircleSimulation, {'vertical_speed': 0.05, 'sun_orbital_radius': 5000, 'sun_orbital_speed': 0.001}, 2),
+    'tilted': (TiltedSimulation, {'forward_speed': 0.1, 'sun_orbital_radius_y': 5000, 'sun_orbital_speed': 0.001,
+                                  'tilt': math.radians(60)}, 2),
+}
+
+SUN_RADIUS = 2
+SUN_COLOR = (1, 1, 0)
+FRAME_NAME = 'frame_%06d.png'
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.mov', '.webm', '.avi')
+
+
+def follow_camera(sun, size, fov=math.pi / 3, margin=1.1):
+    # vpython's default view (looking along -z) following the Sun, far enough back to show all orbits
+    distance = margin * max(data['orbital_radius'] for data in planets_data) / math.tan(fov / 2)
+    return ((sun[0], sun[1], sun[2] + distance), (0, 0, -1), (0, 1, 0), fov, size)
+
+
+def draw_frame(raster, camera, sun, positions, trails, stars, star_colors):
+    raster.clear()
+
+    # Star shell around the Sun
+    if len(stars):
+        screen, depth, _ = project(stars + sun, camera)
+        front = depth > 0
+        raster.points(screen[front], star_colors[front])
+
+    # Trails, behind the bodies
+    for i, data in enumerate(planets_data):
+        if trails.count[i] > 1:
+            screen, _, _ = project(trails.points(i), camera)
+            raster.polyline(screen, data['color'])
+
+    # Sun and planets from back to front; planets are lit from the Sun
+    bodies = np.vstack([sun, positions])
+    radii = [SUN_RADIUS] + [data['radius'] for data in planets_data]
+    colors = [SUN_COLOR] + [data['color'] for data in planets_data]
+    screen, depth, inv = project(bodies, camera)
+    right, up, forward = camera_basis(camera)
+    for i in np.argsort(-depth).tolist():
+        if not depth[i] > 0:
+            continue
+        light = None
+        if i > 0:
+            d = sun - bodies[i]
+            d /= np.linalg.norm(d)
+            light = (d @ right, d @ up, -(d @ forward))
+        raster.sphere(screen[i, 0], screen[i, 1], radii[i] * inv[i], colors[i], light)
+
+
+def render_range(settings, start, stop):
+    # Renders frames [start, stop); runs in a worker process
+    sim_class, parameters, trail_delay = MODES[settings['mode']]
+    sim = sim_class(planets_data, **parameters)
+    speed = settings['speed']
+    fps = settings['fps']
+    size = settings['size']
+    trails = TrailSet(len(planets_data), max_points=settings['trail_points'])
+    raster = Rasterizer(*size)
+    # Same seeded shell in every worker (and as in version_2)
+    stars, star_colors = generate_star_shell(radius=1500, count=settings['stars'], seed=settings['seed'])
+
+    # The scripts push the state after step t + 1 once t / time_speed >= trail_delay; the
+    # trail is replayed from its start, so every range gets exactly the live trails
+    next_step = 1 if trail_delay is None else int(math.ceil(trail_delay * speed)) + 1
+    for frame in range(start, stop):
+        t = frame * speed / fps
+        while next_step <= t:
+            trails.push(sim.positions_at(next_step))
+            next_step += 1
+        sim.set_time(t)
+        draw_frame(raster, follow_camera(sim.sun, size), sim.sun, sim.positions, trails, stars, star_colors)
+        write_png(os.path.join(settings['frame_dir'], FRAME_NAME % frame), raster.rgb())
+    return stop - start
+
+
+def export(mode, out, seconds=10, fps=60, speed=50, size=(1920, 1080), workers=None, stars=2000,
+           trail_points=1000, seed=0):
+    frames = int(round(seconds * fps))
+    video = os.path.splitext(out)[1].lower() in VIDEO_EXTENSIONS
+    if video and shutil.which('ffmpeg') is None:
+        print('ffmpeg not found: use a directory as --out to export an image sequence')
+        return 1
+    if video: # Frames go to a temporary directory next to the video
+        frame_dir = tempfile.mkdtemp(prefix='frames_', dir=os.path.dirname(os.path.abspath(out)))
+    else:
+        frame_dir = out
+        os.makedirs(frame_dir, exist_ok=True)
+
+    settings = {'mode': mode, 'fps': fps, 'speed': speed, 'size': size, 'stars': stars,
+                'trail_points': trail_points, 'seed': seed, 'frame_dir': frame_dir}
+    workers = workers or os.cpu_count() or 1
+    # Contiguous ranges, a few per worker so all workers finish at about the same time
+    bounds = np.linspace(0, frames, min(frames, workers * 4) + 1).astype(int).tolist()
+    ranges = list(zip(bounds[:-1], bounds[1:]))
+
+    started = time.perf_counter()
+    done = 0
+    if workers == 1:
+        for start, stop in ranges:
+            done += render_range(settings, start, stop)
+            print(f'\r{done}/{frames} frames', end='', flush=True)
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(render_range, settings, start, stop) for start, stop in ranges]
+            for future in as_completed(futures):
+                done += future.result()
+                print(f'\r{done}/{frames} frames', end='', flush=True)
+    elapsed = time.perf_counter() - started
+    print(f'\r{frames} frames in {elapsed:.1f} s ({frames / elapsed:.1f} fps, '
+          f'{seconds / elapsed:.1f}x real time) with {workers} workers')
+
+    if video:
+        try:
+            subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-framerate', str(fps),
+                            '-i', os.path.join(frame_dir, FRAME_NAME), '-pix_fmt', 'yuv420p', out], check=True)
+        finally:
+            shutil.rmtree(frame_dir)
+        print(f'-> {out}')
+    else:
+        print(f'-> {frame_dir}/{FRAME_NAME}')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render a presentation mode offline to PNG frames or a video')
+    parser.add_argument('mode', choices=sorted(MODES))
+    parser.add_argument('--out', required=True, help='directory for PNG frames, or a video file (needs ffmpeg)')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--fps', type=int, default=60)
+    parser.add_argument('--speed', type=float, default=50, help='simulation steps per second, like time_speed')
+    parser.add_argument('--size', default='1920x1080', help='WIDTHxHEIGHT')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--stars', type=int, default=2000)
+    parser.add_argument('--trail-points', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    return export(args.mode, args.out, seconds=args.seconds, fps=args.fps, speed=args.speed, size=(width, height),
+                  workers=args.workers, stars=args.stars, trail_points=args.trail_points, seed=args.seed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())